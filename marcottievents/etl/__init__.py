@@ -1 +1 @@
-from .base import ETL, MarcottiLoad, MarcottiTransform, MarcottiEventTransform
+from .base import ETL, FeedLedger, MarcottiLoad, MarcottiTransform, MarcottiEventTransform
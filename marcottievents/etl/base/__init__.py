@@ -1,3 +1,4 @@
 from .workflows import ETL
+from .ledger import FeedLedger, CheckpointJournal
 from .load import MarcottiLoad
 from .transform import MarcottiTransform, MarcottiEventTransform
@@ -0,0 +1,231 @@
+import csv
+import logging
+from io import BytesIO
+
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm.exc import UnmappedColumnError
+from sqlalchemy.dialects import postgresql
+
+from .cache import KeySet
+from .utils import chunks
+
+
+logger = logging.getLogger(__name__)
+
+
+class BulkWriter(object):
+    """
+    Write plain data mappings to database tables with executemany INSERT statements.
+
+    Mappings of models with joined-table inheritance are split into one row per table of the
+    hierarchy, with the polymorphic identity of the model filled in, and tables are written
+    from base table to subclass table.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.dialect = session.get_bind().dialect
+
+    def save(self, model, mappings):
+        """
+        Write data mappings of a data model to the database.
+
+        :param model: Data model class.
+        :param mappings: List of dictionaries keyed by model attribute names.
+        """
+        if not mappings:
+            return
+        for table, rows in self.table_rows(model, mappings):
+            self.write(table, rows)
+
+    def write(self, table, rows):
+        """
+        Insert complete rows into a table.
+
+        :param table: Table object.
+        :param rows: List of dictionaries keyed by table column names.
+        """
+        self.session.execute(table.insert(), rows)
+
+    @staticmethod
+    def table_rows(model, mappings):
+        """
+        Split data mappings of a data model into complete rows of its tables.
+
+        Columns that are missing from a mapping take their Python-side default value, or None.
+
+        :param model: Data model class.
+        :param mappings: List of dictionaries keyed by model attribute names.
+        :return: List of (table, rows) tuples in insertion order.
+        """
+        mapper = class_mapper(model)
+        identity = {}
+        if mapper.polymorphic_on is not None and mapper.polymorphic_identity is not None:
+            identity[mapper.get_property_by_column(mapper.polymorphic_on).key] = mapper.polymorphic_identity
+        tables = []
+        for table in reversed([_mapper.local_table for _mapper in mapper.iterate_to_root()]):
+            if table not in tables:
+                tables.append(table)
+        present = set(identity).union(*mappings)
+        table_rows = []
+        for table in tables:
+            fields = [(column.key, _attribute(mapper, column), column.default) for column in table.columns]
+            fields = [(key, attr, default) for key, attr, default in fields if attr is not None]
+            fields = [(key, attr, default) for key, attr, default in fields
+                      if attr in present or not table.columns[key].primary_key or _has_default(default)]
+            rows = []
+            for mapping in mappings:
+                mapping = dict(identity, **mapping)
+                rows.append({key: mapping[attr] if attr in mapping else _default(default)
+                             for key, attr, default in fields})
+            table_rows.append((table, rows))
+        return table_rows
+
+
+class CopyWriter(BulkWriter):
+    """
+    Stream data mappings to PostgreSQL tables with COPY ... FROM STDIN.
+
+    Rows are serialized into an in-memory CSV buffer per table and sent over the session's
+    connection, so they are part of the session transaction.
+    """
+    NULL = r'\N'
+
+    def write(self, table, rows):
+        columns = [column for column in table.columns if column.key in rows[0]]
+        processors = [column.type.dialect_impl(self.dialect).bind_processor(self.dialect) for column in columns]
+        buf = BytesIO()
+        writer = csv.writer(buf)
+        for row in rows:
+            writer.writerow([self._text(processor(row[column.key]) if processor else row[column.key])
+                             for column, processor in zip(columns, processors)])
+        buf.seek(0)
+        cursor = self.session.connection().connection.cursor()
+        try:
+            cursor.copy_expert(self.statement(table, columns), buf)
+        finally:
+            cursor.close()
+        logger.debug("Copied {} rows into {}".format(len(rows), table.name))
+
+    def statement(self, table, columns):
+        """
+        Compose COPY statement of a table, with the table name qualified by its schema and quoted
+        by the dialect.
+
+        :param table: Table object.
+        :param columns: List of table columns, in CSV field order.
+        :return: COPY statement string.
+        """
+        preparer = self.dialect.identifier_preparer
+        return "COPY {} ({}) FROM STDIN WITH CSV NULL '{}'".format(
+            preparer.format_table(table), ', '.join(preparer.format_column(column) for column in columns),
+            self.NULL)
+
+    def _text(self, value):
+        """
+        Format database value for CSV buffer.
+
+        :param value: Database value, after conversion by column type.
+        :return: String representation of value.
+        """
+        if value is None:
+            return self.NULL
+        if isinstance(value, unicode):
+            return value.encode('utf-8')
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, float):
+            return repr(value)
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+
+def bulk_writer(session):
+    """
+    Create bulk writer for the database dialect of a session: COPY for PostgreSQL, executemany
+    INSERTs for other databases.
+
+    :param session: Database session.
+    :return: :class:`CopyWriter` or :class:`BulkWriter` object.
+    """
+    if session.get_bind().dialect.name == 'postgresql':
+        return CopyWriter(session)
+    return BulkWriter(session)
+
+
+def insert_ignore(session, model, mappings):
+    """
+    Insert data mappings of a single-table data model, skipping records whose primary key is
+    already in the table.
+
+    Records are written with one statement per chunk of mappings, using the native upsert of the
+    database: INSERT ... ON CONFLICT DO NOTHING on PostgreSQL, INSERT OR IGNORE on SQLite, and
+    INSERT IGNORE on MySQL.  On other databases the existing primary keys of every chunk are
+    retrieved first and the matching mappings are dropped.
+
+    :param session: Database session.
+    :param model: Data model class.
+    :param mappings: List of dictionaries keyed by model fields, which are also table column names.
+    """
+    table = model.__table__
+    dialect = session.get_bind().dialect.name
+    primary_keys = None
+    if dialect == 'postgresql':
+        statement = postgresql.insert(table).on_conflict_do_nothing()
+    elif dialect == 'sqlite':
+        statement = table.insert().prefix_with('OR IGNORE')
+    elif dialect == 'mysql':
+        statement = table.insert().prefix_with('IGNORE')
+    else:
+        statement = table.insert()
+        primary_keys = KeySet(session, model, [column.key for column in table.primary_key])
+    for chunk in chunks(mappings):
+        if primary_keys is not None:
+            primary_keys.prefetch([primary_keys.key(mapping) for mapping in chunk])
+            rows = []
+            for mapping in chunk:
+                if primary_keys.key(mapping) not in primary_keys:
+                    primary_keys.add(primary_keys.key(mapping))
+                    rows.append(mapping)
+            chunk = rows
+        if chunk:
+            session.execute(statement, chunk)
+
+
+def _attribute(mapper, column):
+    """
+    Name of the mapped attribute of a table column.
+
+    :param mapper: Mapper of data model.
+    :param column: Table column.
+    :return: Attribute name, or None if the column is not mapped by the data model, e.g. a column
+             of another model in single-table inheritance.
+    """
+    try:
+        return mapper.get_property_by_column(column).key
+    except UnmappedColumnError:
+        return None
+
+
+def _has_default(default):
+    """
+    Test whether a column has a Python-side default value.  Primary keys without one are
+    generated by the database.
+
+    :param default: Column default object, or None.
+    :return: True if the default is a scalar or a Python callable.
+    """
+    return default is not None and (default.is_scalar or default.is_callable)
+
+
+def _default(default):
+    """
+    Python-side default value of a column.
+
+    :param default: Column default object, or None.
+    :return: Default value, or None.
+    """
+    if not _has_default(default):
+        return None
+    return default.arg if default.is_scalar else default.arg(None)
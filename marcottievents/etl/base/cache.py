@@ -0,0 +1,578 @@
+from itertools import chain
+from collections import OrderedDict
+
+import pandas as pd
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import aliased
+
+from marcottievents.models.common.overview import Countries, Timezones, Surfaces, Seasons, Years
+from marcottievents.models.common.personnel import Positions
+from marcottievents.models.common.match import MatchLineups
+from .reconcile import PersonReconciler
+from .utils import chunks, null_to_none
+
+
+class KeySet(object):
+    """
+    In-memory set of the natural keys of records in a data model.
+
+    Keys are retrieved from the database with one query per chunk of candidate keys, and the keys
+    of records staged for insertion are added to the set, so that the existence of a record is
+    tested without a database query per data row.
+
+    The set maps every key to the local ID of its record, or None if the model has no ID field
+    or the record has been staged without one.
+
+    Once all keys of the model have been retrieved, the set is complete and candidate keys that
+    are not in the set are not looked up again.
+    """
+
+    def __init__(self, session, model, fields, **conditions):
+        """
+        :param session: Database session.
+        :param model: Data model class.
+        :param fields: List of model fields that make up the natural key.
+        :param conditions: Fixed field values of the model records, e.g. supplier ID of mapper records.
+        """
+        self.session = session
+        self.model = model
+        self.fields = list(fields)
+        self.conditions = conditions
+        self.keys = {}
+        self.complete = False
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, key):
+        """
+        Return local ID of the record with a natural key.
+
+        :param key: Tuple of natural key values.
+        :return: Local ID of the record, or None.
+        """
+        return self.keys.get(key)
+
+    def add(self, key, local_id=None):
+        """
+        Add natural key of a staged record to the set.
+
+        :param key: Tuple of natural key values.
+        :param local_id: Local ID of the record.
+        """
+        self.keys[key] = local_id
+
+    def key(self, row):
+        """
+        Compose natural key of a data row.
+
+        :param row: Data row (Series or dictionary).
+        :return: Tuple of natural key values.
+        """
+        return tuple(null_to_none(row[field]) if field in row else None for field in self.fields)
+
+    def frame_keys(self, data_frame):
+        """
+        Compose natural keys of all rows of a data frame.
+
+        :param data_frame: Pandas DataFrame.
+        :return: List of natural key tuples, in row order.
+        """
+        columns = [data_frame[field].values if field in data_frame.columns else [None] * len(data_frame)
+                   for field in self.fields]
+        return [tuple(null_to_none(value) for value in values) for values in zip(*columns)]
+
+    def prefetch(self, candidates=None):
+        """
+        Retrieve natural keys of existing records from the database.
+
+        If candidate keys are passed, only the candidates that are not already in the set are
+        retrieved, with one query per chunk of candidates.  Otherwise all keys of the model are
+        retrieved in one query.
+
+        :param candidates: Iterable of natural key tuples, or None.
+        """
+        columns = [getattr(self.model, field) for field in self.fields]
+        id_column = getattr(self.model, 'id', None)
+        entities = columns + [id_column] if id_column is not None else columns
+        query = self.session.query(*entities).filter(
+            *[getattr(self.model, field) == value for field, value in self.conditions.items()])
+        if candidates is None:
+            records = query
+            self.complete = True
+        elif self.complete:
+            return
+        else:
+            unknown = list(set(key for key in candidates if key not in self.keys))
+            records = chain.from_iterable(query.filter(self._key_clause(columns, chunk))
+                                          for chunk in chunks(unknown))
+        for record in records:
+            self.keys[tuple(record[:len(columns)])] = record[-1] if id_column is not None else None
+
+    def missing(self, data_frame):
+        """
+        Select rows of a data frame whose natural keys are not in the database, and add their
+        keys to the set.  Rows with duplicate keys are selected once.
+
+        :param data_frame: Pandas DataFrame.
+        :return: DataFrame of rows to be staged for insertion.
+        """
+        keys = self.frame_keys(data_frame)
+        self.prefetch(keys)
+        mask = []
+        for key in keys:
+            mask.append(key not in self.keys)
+            if key not in self.keys:
+                self.add(key)
+        return data_frame[pd.Series(mask, index=data_frame.index, dtype=bool)]
+
+    @staticmethod
+    def _key_clause(columns, keys):
+        """
+        Filter clause that selects records whose natural key fields take values from a chunk of keys.
+
+        :param columns: List of model fields that make up the natural key.
+        :param keys: List of natural key tuples.
+        :return: SQL filter clause.
+        """
+        clauses = []
+        for column, values in zip(columns, zip(*keys)):
+            values = set(values)
+            if None in values:
+                values.discard(None)
+                clauses.append(or_(column.in_(values), column.is_(None)) if values else column.is_(None))
+            else:
+                clauses.append(column.in_(values))
+        return and_(*clauses)
+
+
+class RemoteIdResolver(object):
+    """
+    Cache of the remote-to-local ID mappings in supplier mapper models (CompetitionMap, ClubMap,
+    PlayerMap, MatchMap, MatchEventMap, etc.).
+
+    By default the complete mapping of a supplier is loaded with one query the first time a mapper
+    model is used.  If a maximum size is set, the cache of every mapper model holds at most that
+    many remote IDs and discards the least recently used ones, and IDs that are not in the cache
+    are retrieved from the database in chunks.
+    """
+
+    def __init__(self, session, maxsize=None):
+        """
+        :param session: Database session.
+        :param maxsize: Maximum number of cached remote IDs per mapper model and supplier, or None
+                        to load complete mappings.
+        """
+        self.session = session
+        self.maxsize = maxsize
+        self.mappings = {}
+
+    def mapping(self, model, supplier_id):
+        """
+        Return the cached remote-to-local ID mapping of a mapper model and supplier.
+
+        :param model: Mapper model class.
+        :param supplier_id: Supplier ID.
+        :return: Dictionary of local IDs keyed by remote ID.
+        """
+        if (model, supplier_id) not in self.mappings:
+            if self.maxsize is None:
+                query = self.session.query(model.remote_id, model.id).filter(model.supplier_id == supplier_id)
+                self.mappings[(model, supplier_id)] = {remote_id: local_id for remote_id, local_id in query}
+            else:
+                self.mappings[(model, supplier_id)] = OrderedDict()
+        return self.mappings[(model, supplier_id)]
+
+    def get(self, model, remote_id, supplier_id):
+        """
+        Return the local ID that corresponds to a supplier's remote ID.
+
+        :param model: Mapper model class.
+        :param remote_id: Remote ID.
+        :param supplier_id: Supplier ID.
+        :return: Local ID, or None if the remote ID is not mapped.
+        """
+        remote_id = null_to_none(remote_id)
+        if remote_id is None:
+            return None
+        mapping = self.mapping(model, supplier_id)
+        if self.maxsize is None:
+            return mapping.get(remote_id)
+        if remote_id not in mapping:
+            self.prefetch(model, [remote_id], supplier_id)
+        local_id = mapping.pop(remote_id)
+        mapping[remote_id] = local_id
+        return local_id
+
+    def prefetch(self, model, remote_ids, supplier_id):
+        """
+        Retrieve local IDs of remote IDs that are not in a bounded cache, with one query per chunk.
+        Remote IDs without a mapper record are cached as unmapped.
+
+        :param model: Mapper model class.
+        :param remote_ids: Iterable of remote IDs.
+        :param supplier_id: Supplier ID.
+        """
+        mapping = self.mapping(model, supplier_id)
+        if self.maxsize is None:
+            return
+        unknown = list(set(null_to_none(remote_id) for remote_id in remote_ids) - set(mapping) - {None})
+        for chunk in chunks(unknown, self.maxsize):
+            query = self.session.query(model.remote_id, model.id).filter(
+                model.supplier_id == supplier_id, model.remote_id.in_(chunk))
+            found = {remote_id: local_id for remote_id, local_id in query}
+            self._store(mapping, [(remote_id, found.get(remote_id)) for remote_id in chunk])
+
+    def map(self, model, values, supplier_id):
+        """
+        Convert a column of remote IDs into local IDs.
+
+        :param model: Mapper model class.
+        :param values: Series of remote IDs.
+        :param supplier_id: Supplier ID.
+        :return: Series of local IDs, with None for unmapped remote IDs.
+        """
+        if self.maxsize is None:
+            lookup = self.mapping(model, supplier_id)
+        else:
+            lookup = {}
+            for chunk in chunks(list(values.dropna().unique()), self.maxsize):
+                self.prefetch(model, chunk, supplier_id)
+                lookup.update((remote_id, self.get(model, remote_id, supplier_id)) for remote_id in chunk)
+        return pd.Series([lookup.get(null_to_none(remote_id)) for remote_id in values], index=values.index,
+                         dtype=object)
+
+    def extend(self, model, supplier_id, pairs):
+        """
+        Add remote-to-local ID pairs of new mapper records to the cache.
+
+        :param model: Mapper model class.
+        :param supplier_id: Supplier ID.
+        :param pairs: Iterable of (remote ID, local ID) tuples.
+        """
+        if (model, supplier_id) in self.mappings:
+            self._store(self.mappings[(model, supplier_id)], pairs)
+
+    def invalidate(self, model=None, supplier_id=None):
+        """
+        Discard cached mappings, so that they are retrieved again from the database.
+
+        :param model: Mapper model class, or None for all models.
+        :param supplier_id: Supplier ID, or None for all suppliers.
+        """
+        for key in list(self.mappings):
+            if model in (None, key[0]) and supplier_id in (None, key[1]):
+                del self.mappings[key]
+
+    def _store(self, mapping, pairs):
+        for remote_id, local_id in pairs:
+            mapping.pop(remote_id, None)
+            mapping[remote_id] = local_id
+        if self.maxsize is not None:
+            while len(mapping) > self.maxsize:
+                mapping.popitem(last=False)
+
+
+class NameIndex(object):
+    """
+    In-process index of the full names of persons (players, managers, referees) in a data model.
+
+    Names are looked up in the indexed search name column of the model, with one query per chunk
+    of names that are not in the index yet.  Names that match more than one person are kept as
+    ambiguous.  Names that match no person are not kept, so that persons loaded later are found.
+    """
+
+    def __init__(self, session, model):
+        """
+        :param session: Database session.
+        :param model: Person data model class.
+        """
+        self.session = session
+        self.model = model
+        self.names = {}
+        self.ambiguous = set()
+
+    def prefetch(self, names):
+        """
+        Retrieve local IDs of names that are not in the index.
+
+        :param names: Iterable of full names.
+        """
+        unknown = list(set(null_to_none(name) for name in names) - set(self.names) - self.ambiguous - {None})
+        for chunk in chunks(unknown):
+            query = self.session.query(self.model.search_name, self.model.id).filter(
+                self.model.search_name.in_(chunk))
+            found = {}
+            for name, local_id in query:
+                found.setdefault(name, set()).add(local_id)
+            for name, local_ids in found.items():
+                if len(local_ids) > 1:
+                    self.ambiguous.add(name)
+                else:
+                    self.names[name] = local_ids.pop()
+
+    def map(self, values):
+        """
+        Convert a column of full names into local IDs.
+
+        :param values: Series of full names.
+        :return: Series of local IDs, with None for unknown or ambiguous names.
+        """
+        self.prefetch(values.dropna().unique())
+        return values.map(lambda name: self.names.get(null_to_none(name)))
+
+
+class SeasonIndex(object):
+    """
+    Cache of season IDs keyed by season name.
+
+    Season names are composed from the years of all seasons, which are retrieved with one query
+    the first time a season is looked up, so that season names are resolved without the
+    subqueries of the :attr:`Seasons.name` expression.  The cache is invalidated when seasons
+    are loaded.
+    """
+
+    def __init__(self, session):
+        """
+        :param session: Database session.
+        """
+        self.session = session
+        self.names = None
+
+    def mapping(self):
+        """
+        Return the cached mapping of season names to season IDs.
+
+        :return: Dictionary of season IDs keyed by season name.
+        """
+        if self.names is None:
+            start_year, end_year = aliased(Years), aliased(Years)
+            query = self.session.query(Seasons.id, start_year.yr, end_year.yr).join(
+                start_year, Seasons.start_year_id == start_year.id).join(
+                end_year, Seasons.end_year_id == end_year.id)
+            self.names = {self.name(start, end): season_id for season_id, start, end in query}
+        return self.names
+
+    def get(self, name):
+        """
+        Return the ID of a season.
+
+        :param name: Season name, of form YYYY or YYYY-YYYY.
+        :return: Season ID, or None if there is no season with that name.
+        """
+        name = null_to_none(name)
+        if name is None:
+            return None
+        if isinstance(name, float):
+            name = int(name)
+        return self.mapping().get(unicode(name).strip())
+
+    def map(self, values):
+        """
+        Convert a column of season names into season IDs.
+
+        :param values: Series of season names.
+        :return: Series of season IDs, with None for unknown seasons.
+        """
+        return pd.Series([self.get(name) for name in values], index=values.index, dtype=object)
+
+    def invalidate(self):
+        """
+        Discard the cached season names, so that they are retrieved again from the database.
+        """
+        self.names = None
+
+    @staticmethod
+    def name(start_year, end_year):
+        """
+        Compose season name from its years, as in :attr:`Seasons.name`.
+
+        :param start_year: Start year of season.
+        :param end_year: End year of season.
+        :return: Season name.
+        """
+        if start_year == end_year:
+            return unicode(start_year)
+        return u"{0}-{1}".format(start_year, end_year)
+
+
+class MatchIndex(object):
+    """
+    In-memory index of matches keyed by their natural key fields, e.g. competition, season,
+    matchday, home team and away team of league matches.
+
+    The matches of the seasons present in a data frame are retrieved with one query, and the match
+    IDs of the data rows are resolved with a merge on the key fields.
+    """
+
+    def __init__(self, session, model, fields):
+        """
+        :param session: Database session.
+        :param model: Match data model class.
+        :param fields: List of model fields that make up the natural key, including 'season_id'.
+        """
+        self.session = session
+        self.model = model
+        self.fields = list(fields)
+        self.ambiguous = []
+
+    def build(self, season_ids):
+        """
+        Retrieve the natural keys and IDs of the matches in a set of seasons.
+
+        Keys that belong to more than one match are dropped from the index and kept in `ambiguous`.
+
+        :param season_ids: Iterable of season IDs.
+        :return: DataFrame of natural key fields and 'match_id', with one row per key.
+        """
+        season_ids = list(set(null_to_none(season_id) for season_id in season_ids) - {None})
+        columns = [getattr(self.model, field) for field in self.fields] + [self.model.id]
+        records = self.session.query(*columns).filter(self.model.season_id.in_(season_ids)).all() \
+            if season_ids else []
+        index = self._keys(pd.DataFrame.from_records(records, columns=self.fields + ['match_id']))
+        duplicated = index.duplicated(self.fields, keep=False)
+        self.ambiguous = sorted(set(map(tuple, index.loc[duplicated, self.fields].values)))
+        return index[~duplicated]
+
+    def resolve(self, keys_frame):
+        """
+        Resolve the match IDs of data rows.
+
+        :param keys_frame: DataFrame of natural key fields.
+        :return: Series of match IDs aligned with the data rows, with None for unknown or
+                 ambiguous keys.
+        """
+        keys = self._keys(keys_frame[self.fields])
+        merged = keys.merge(self.build(keys['season_id']), on=self.fields, how='left')
+        return pd.Series(merged['match_id'].where(merged['match_id'].notnull(), None).values,
+                         index=keys_frame.index, dtype=object)
+
+    def _keys(self, data_frame):
+        """
+        Normalize natural key fields for merging: missing values become None.
+
+        :param data_frame: DataFrame of natural key fields.
+        :return: DataFrame of natural key fields of object type.
+        """
+        data_frame = data_frame.copy()
+        for field in self.fields:
+            data_frame[field] = pd.Series([null_to_none(value) for value in data_frame[field]],
+                                          index=data_frame.index, dtype=object)
+        return data_frame
+
+
+class ReferenceCache(object):
+    """
+    Cache of reference data that is shared by the transform and load stages of an ETL run.
+
+    The cache holds the remote ID resolver of the supplier mapper models, the season name index,
+    key sets of the small validation tables (countries, timezones, surfaces, positions), and the
+    person reconcilers of the person models.  Every validation table and person model is read from
+    the database in full the first time it is used, and the records that are written during the
+    run are added to its key sets or reconciler.
+    """
+    MODELS = (Countries, Timezones, Surfaces, Positions)
+
+    def __init__(self, session, resolver=None):
+        """
+        :param session: Database session.
+        :param resolver: Remote ID resolver, or None to create one without a size limit.
+        """
+        self.session = session
+        self.resolver = resolver or RemoteIdResolver(session)
+        self.season_names = SeasonIndex(session)
+        self.key_sets = {}
+        self.reconcilers = {}
+
+    def keys(self, model, fields):
+        """
+        Return the key set of a validation table, with all keys retrieved the first time.
+
+        :param model: Data model class.
+        :param fields: List of model fields that make up the natural key.
+        :return: :class:`KeySet` object.
+        """
+        if (model, tuple(fields)) not in self.key_sets:
+            key_set = KeySet(self.session, model, fields)
+            key_set.prefetch()
+            self.key_sets[(model, tuple(fields))] = key_set
+        return self.key_sets[(model, tuple(fields))]
+
+    def reconciler(self, model, fields):
+        """
+        Return the person reconciler of a person data model, which retrieves the existing persons
+        the first time it classifies records.
+
+        :param model: Person data model class.
+        :param fields: List of model fields that are loaded from the data feed.
+        :return: :class:`PersonReconciler` object.
+        """
+        if (model, tuple(fields)) not in self.reconcilers:
+            self.reconcilers[(model, tuple(fields))] = PersonReconciler(self.session, model, fields)
+        return self.reconcilers[(model, tuple(fields))]
+
+    def lookup(self, model, field, values):
+        """
+        Retrieve local IDs of validation table records from their field values.
+
+        :param model: Data model class.
+        :param field: Model field that the values refer to.
+        :param values: Iterable of field values.
+        :return: Dictionary of local IDs keyed by the values that were found.
+        """
+        key_set = self.keys(model, [field])
+        return {value: key_set.get((value,)) for value in values if (value,) in key_set}
+
+    def invalidate(self):
+        """
+        Discard all cached reference data, so that it is retrieved again from the database.
+        """
+        self.resolver.invalidate()
+        self.season_names.invalidate()
+        self.key_sets.clear()
+        self.reconcilers.clear()
+
+
+class LineupCache(object):
+    """
+    Cache of the lineup IDs of players in matches.
+
+    The lineup of a match is retrieved with one query the first time one of its players is
+    looked up, and is kept until it is evicted.
+    """
+
+    def __init__(self, session):
+        """
+        :param session: Database session.
+        """
+        self.session = session
+        self.lineups = {}
+
+    def get(self, match_id, player_id):
+        """
+        Return the lineup ID of a player in a match.
+
+        :param match_id: Match ID.
+        :param player_id: Player ID.
+        :return: Lineup ID.
+        :raises KeyError: If the player is not in the lineup of the match.
+        """
+        if match_id not in self.lineups:
+            query = self.session.query(MatchLineups.player_id, MatchLineups.id).filter(
+                MatchLineups.match_id == match_id)
+            self.lineups[match_id] = {lineup_player_id: lineup_id for lineup_player_id, lineup_id in query}
+        return self.lineups[match_id][player_id]
+
+    def retain(self, match_ids):
+        """
+        Evict lineups of all matches except the ones passed.
+
+        :param match_ids: Iterable of match IDs to be kept in the cache.
+        """
+        match_ids = set(match_ids)
+        for match_id in list(self.lineups):
+            if match_id not in match_ids:
+                del self.lineups[match_id]
@@ -0,0 +1,166 @@
+import os
+import bz2
+import glob
+import gzip
+import fnmatch
+import zipfile
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+
+EXTENSIONS = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz', '.zip': 'zip'}
+
+MAGIC = [('\x1f\x8b', 'gzip'), ('BZh', 'bz2'), ('\xfd7zXZ\x00', 'xz'), ('PK\x03\x04', 'zip')]
+
+
+def compression(path):
+    """
+    Identify the compression format of a data file by its extension, or else by its magic bytes.
+
+    :param path: Path of data file.
+    :return: 'gzip', 'bz2', 'xz', 'zip', or None if the file is not compressed.
+    """
+    kind = EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if kind is not None:
+        return kind
+    with open(path, 'rb') as f:
+        head = f.read(max(len(magic) for magic, _ in MAGIC))
+    for magic, kind in MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def split_member(path):
+    """
+    Split the path of a member of a zip archive, e.g. 'feeds/2016.zip/lineups_001.csv', into the
+    path of the archive and the name of the member.
+
+    :param path: Path of data file or zip archive member.
+    :return: Tuple of archive path and member name, or of the path and None if the path does not
+             refer to a zip archive member.
+    """
+    if os.path.exists(path):
+        return path, None
+    archive, names = path, []
+    while archive and not os.path.isfile(archive):
+        archive, name = os.path.split(archive)
+        if not name:
+            return path, None
+        names.insert(0, name)
+    if names and archive and zipfile.is_zipfile(archive):
+        return archive, '/'.join(names)
+    return path, None
+
+
+def open_feed(path):
+    """
+    Open a data file for reading, decompressing it while it is read.
+
+    Files compressed with gzip, bzip2 or xz, zip archives with a single member, and members of zip
+    archives are read without extracting them to disk.  Reading xz files requires the `lzma`
+    module (`backports.lzma` on Python 2).
+
+    :param path: Path of data file or zip archive member.
+    :return: File object of the decompressed data, in binary mode.
+    """
+    archive, member = split_member(path)
+    if member is not None:
+        with zipfile.ZipFile(archive) as zf:
+            return zf.open(member)
+    kind = compression(path)
+    if kind == 'gzip':
+        return gzip.open(path, 'rb')
+    if kind == 'bz2':
+        return bz2.BZ2File(path, 'rb')
+    if kind == 'xz':
+        if lzma is None:
+            raise IOError("Reading xz-compressed file {} requires the lzma module".format(path))
+        return lzma.LZMAFile(path, 'rb')
+    if kind == 'zip':
+        with zipfile.ZipFile(path) as zf:
+            members = archive_members(zf)
+            if len(members) != 1:
+                raise IOError("Zip archive {} has {} members, expected one".format(path, len(members)))
+            return zf.open(members[0])
+    return open(path, 'rb')
+
+
+def archive_members(zf):
+    """
+    List the names of the file members of a zip archive.
+
+    :param zf: :class:`zipfile.ZipFile` object.
+    :return: List of member names, in archive order.
+    """
+    return [info.filename for info in zf.infolist() if not info.filename.endswith('/')]
+
+
+def split_archive_pattern(pattern):
+    """
+    Split a glob pattern that names members of zip archives, e.g. 'feeds/2016*.zip/lineups_*.csv',
+    into the pattern of the archives and the pattern of the member names.
+
+    :param pattern: Glob pattern of data file paths.
+    :return: Tuple of archive pattern and member pattern, or of the pattern and None if the pattern
+             does not name a zip archive.
+    """
+    parts = pattern.replace(os.sep, '/').split('/')
+    for indx, part in enumerate(parts[:-1]):
+        if part.lower().endswith('.zip'):
+            return os.path.normpath('/'.join(parts[:indx + 1])), '/'.join(parts[indx + 1:])
+    return pattern, None
+
+
+def feed_files(pattern):
+    """
+    List the data files that match a glob pattern, including compressed files and members of zip
+    archives.
+
+    Compressed files match if their names without the compression extension match the pattern,
+    and zip archives that match the pattern are expanded into their members.  Members of zip
+    archives are otherwise listed only if the pattern names the archive explicitly, as in
+    'feeds/2016.zip/events_*.csv'; the archive part of such a pattern may be a glob pattern too.
+
+    :param pattern: Glob pattern of data file paths.
+    :return: Sorted list of paths of data files and zip archive members.
+    """
+    paths = set()
+    archives, members = split_archive_pattern(pattern)
+    if members is not None:
+        for archive in glob.glob(archives):
+            if zipfile.is_zipfile(archive):
+                with zipfile.ZipFile(archive) as zf:
+                    paths.update(os.path.join(archive, member) for member in archive_members(zf)
+                                 if fnmatch.fnmatch(member, members))
+        return sorted(paths)
+    for ext in [''] + sorted(EXTENSIONS):
+        for path in glob.glob(pattern + ext):
+            if compression(path) == 'zip':
+                with zipfile.ZipFile(path) as zf:
+                    paths.update(os.path.join(path, member) for member in archive_members(zf))
+            else:
+                paths.add(path)
+    return sorted(paths)
+
+
+def feed_stat(path):
+    """
+    Return the size and modification time of a data file.  Members of zip archives take their
+    uncompressed size and the modification time of the archive.
+
+    :param path: Path of data file or zip archive member.
+    :return: Tuple of size in bytes and modification time.
+    """
+    archive, member = split_member(path)
+    stat = os.stat(archive)
+    if member is None:
+        return stat.st_size, stat.st_mtime
+    with zipfile.ZipFile(archive) as zf:
+        return zf.getinfo(member).file_size, stat.st_mtime
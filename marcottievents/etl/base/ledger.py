@@ -0,0 +1,251 @@
+import os
+import hashlib
+import logging
+
+from marcottievents.models.common.suppliers import Suppliers
+from marcottievents.models.common.ingestion import IngestionLedger, LoadCheckpoints
+from .compression import split_member, open_feed, feed_stat
+from .utils import record_items
+
+
+logger = logging.getLogger(__name__)
+
+
+class FeedLedger(object):
+    """
+    Ledger of the data feed files that have been ingested into the database.
+
+    Extractors ask the ledger whether a file has changed since it was last ingested.  A file is
+    unchanged if its size and modification time match the ledger, or else if its content hash
+    matches.  Changed files are held as pending entries until the data extracted from them is
+    loaded, and are then committed to the ledger.
+
+    A file that is read for several data entities, e.g. an XML feed of match events and actions,
+    is committed for all of its entities together, once every one of them has been loaded, and is
+    discarded for all of them if one of them fails to load.
+    """
+    BLOCK_SIZE = 1 << 16
+
+    def __init__(self, session, supplier=None):
+        """
+        :param session: Database session.
+        :param supplier: Name of data supplier, or None.
+        """
+        self.session = session
+        self.supplier_id = session.query(Suppliers).filter_by(name=supplier).one().id if supplier else None
+        self.entries = {}
+        self.pending = {}
+        self.groups = {}
+        self.loaded = {}
+
+    def recorded(self, entity):
+        """
+        Return the ledger entries of a data entity, retrieved with one query the first time.
+
+        :param entity: Data entity name.
+        :return: Dictionary of :class:`IngestionLedger` objects keyed by file path.
+        """
+        if entity not in self.entries:
+            records = self.session.query(IngestionLedger).filter_by(entity=entity, supplier_id=self.supplier_id)
+            self.entries[entity] = {record.path: record for record in records}
+        return self.entries[entity]
+
+    def changed(self, path, entity):
+        """
+        Test whether a data file has changed since it was last ingested for a data entity, or for
+        any of several data entities that are read from the file.
+
+        Changed files are added to the pending entries of the entities.
+
+        :param path: Path of data file.
+        :param entity: Data entity name, or list of data entity names.
+        :return: True if the file is new or changed, False otherwise.
+        """
+        entities = [entity] if isinstance(entity, basestring) else list(entity)
+        path = unicode(os.path.abspath(path))
+        size, mtime = feed_stat(path)
+        entries = [self.recorded(name).get(path) for name in entities]
+        if all(entry is not None and entry.size == size and entry.mtime == mtime for entry in entries):
+            logger.info("Skipping unchanged file {}".format(path))
+            return False
+        content_hash = self.file_hash(path)
+        if all(entry is not None and entry.content_hash == content_hash for entry in entries):
+            for entry in entries:
+                entry.size, entry.mtime = size, mtime
+            logger.info("Skipping unchanged file {}".format(path))
+            return False
+        for name in entities:
+            self.pending.setdefault(name, {})[path] = dict(size=size, mtime=mtime, content_hash=content_hash)
+        if len(entities) > 1:
+            self.groups[path] = set(entities)
+            self.loaded[path] = set()
+        return True
+
+    def commit(self, entity=None):
+        """
+        Commit pending entries to the ledger.  Entries of files that are read for several data
+        entities are committed once all of the entities have been committed.
+
+        :param entity: Data entity name, or None to commit pending entries of all entities.
+        """
+        for pending_entity in [entity] if entity is not None else list(self.pending):
+            for path in list(self.pending.get(pending_entity, {})):
+                if path in self.groups:
+                    self.loaded[path].add(pending_entity)
+                    if self.loaded[path] != self.groups[path]:
+                        continue
+                    names = self.groups.pop(path)
+                    del self.loaded[path]
+                else:
+                    names = [pending_entity]
+                for name in names:
+                    self.write(name, path, self.pending[name].pop(path))
+        self.session.commit()
+
+    def write(self, entity, path, fingerprint):
+        """
+        Add or update the ledger entry of a data file.
+
+        :param entity: Data entity name.
+        :param path: Absolute path of data file.
+        :param fingerprint: Dictionary of file size, modification time and content hash.
+        """
+        entry = self.recorded(entity).get(path)
+        if entry is None:
+            entry = IngestionLedger(path=path, entity=entity, supplier_id=self.supplier_id)
+            self.session.add(entry)
+            self.entries[entity][path] = entry
+        for field, value in fingerprint.items():
+            setattr(entry, field, value)
+
+    def discard(self, entity=None):
+        """
+        Discard pending entries, so that the files are ingested again on the next run.  Files that
+        are read for several data entities are discarded for all of the entities.
+
+        :param entity: Data entity name, or None to discard pending entries of all entities.
+        """
+        if entity is None:
+            self.pending.clear()
+            self.groups.clear()
+            self.loaded.clear()
+            return
+        for path in list(self.pending.pop(entity, {})):
+            for name in self.groups.pop(path, []):
+                self.pending.get(name, {}).pop(path, None)
+            self.loaded.pop(path, None)
+
+    @classmethod
+    def file_hash(cls, path):
+        """
+        Calculate SHA-256 hash of file contents, or of the uncompressed contents of a member of a
+        zip archive.
+
+        :param path: Path of data file or zip archive member.
+        :return: Hexadecimal digest string.
+        """
+        digest = hashlib.sha256()
+        with open_feed(path) if split_member(path)[1] is not None else open(path, 'rb') as f:
+            for block in iter(lambda: f.read(cls.BLOCK_SIZE), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+
+class CheckpointJournal(object):
+    """
+    Journal of the chunks of match data that have been loaded for a supplier.
+
+    Chunks are identified by data entity, match, and the index of the chunk among the chunks of the
+    match, so a restarted load of the same data skips the chunks that have been committed.  Every
+    chunk is recorded with the batch size of the load, its number of data rows and a hash of its
+    contents.  A chunk with the same index that was split with another batch size, or that holds
+    other data rows, does not match the journal and cannot be resumed.
+    """
+
+    def __init__(self, session, supplier_id=None):
+        """
+        :param session: Database session.
+        :param supplier_id: Supplier ID, or None.
+        """
+        self.session = session
+        self.supplier_id = supplier_id
+        self.chunks = {}
+
+    @staticmethod
+    def chunk_hash(data_frame):
+        """
+        Calculate SHA-256 hash of the data rows of a chunk, independent of their index labels.
+
+        :param data_frame: DataFrame of data rows.
+        :return: Hexadecimal digest string.
+        """
+        digest = hashlib.sha256()
+        for row in record_items(data_frame, list(data_frame.columns)):
+            digest.update(repr(row))
+        return digest.hexdigest()
+
+    def recorded(self, entity):
+        """
+        Return the completed chunks of a data entity, retrieved with one query the first time.
+
+        :param entity: Data entity name.
+        :return: Dictionary of (batch size, row count, content hash) tuples keyed by (match ID,
+                 chunk index) tuples.
+        """
+        if entity not in self.chunks:
+            query = self.session.query(LoadCheckpoints.match_id, LoadCheckpoints.chunk,
+                                       LoadCheckpoints.batch_size, LoadCheckpoints.row_count,
+                                       LoadCheckpoints.content_hash).filter_by(
+                entity=entity, supplier_id=self.supplier_id)
+            self.chunks[entity] = {(match_id, chunk): fingerprint
+                                   for match_id, chunk, fingerprint in
+                                   ((row[0], row[1], tuple(row[2:])) for row in query)}
+        return self.chunks[entity]
+
+    def completed(self, entity, match_id, chunk, batch_size, data_frame):
+        """
+        Test whether a chunk of match data has been loaded.
+
+        :param entity: Data entity name.
+        :param match_id: Match ID.
+        :param chunk: Chunk index within match.
+        :param batch_size: Batch size of the load, or None.
+        :param data_frame: DataFrame of data rows of the chunk.
+        :return: True if the chunk has been loaded.
+        :raises ValueError: If the chunk was loaded with another batch size or other data rows.
+        """
+        fingerprint = self.recorded(entity).get((match_id, chunk))
+        if fingerprint is None:
+            return False
+        if fingerprint != (batch_size, len(data_frame), self.chunk_hash(data_frame)):
+            raise ValueError(
+                "Checkpoint of {} chunk {} of match {} does not match the data (batch size {}, {} rows); "
+                "clear the checkpoints of the entity to load it again".format(
+                    entity, chunk, match_id, fingerprint[0], fingerprint[1]))
+        return True
+
+    def record(self, entity, match_id, chunk, batch_size, data_frame):
+        """
+        Add a loaded chunk to the journal.  The journal record is committed with the session.
+
+        :param entity: Data entity name.
+        :param match_id: Match ID.
+        :param chunk: Chunk index within match.
+        :param batch_size: Batch size of the load, or None.
+        :param data_frame: DataFrame of data rows of the chunk.
+        """
+        fingerprint = (batch_size, len(data_frame), self.chunk_hash(data_frame))
+        self.session.add(LoadCheckpoints(entity=entity, match_id=match_id, chunk=chunk, batch_size=batch_size,
+                                         row_count=fingerprint[1], content_hash=fingerprint[2],
+                                         supplier_id=self.supplier_id))
+        self.recorded(entity)[(match_id, chunk)] = fingerprint
+
+    def clear(self, entity):
+        """
+        Delete the journal records of a data entity, so that all of its data is loaded again.
+
+        :param entity: Data entity name.
+        """
+        self.session.query(LoadCheckpoints).filter_by(entity=entity, supplier_id=self.supplier_id).delete()
+        self.session.commit()
+        self.chunks.pop(entity, None)
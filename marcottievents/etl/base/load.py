@@ -1,5 +1,6 @@
 import uuid
 import logging
+from itertools import izip
 
 import marcottievents.models.common.enums as enums
 import marcottievents.models.common.suppliers as mcs
@@ -9,6 +10,10 @@ import marcottievents.models.common.match as mcm
 import marcottievents.models.common.events as mce
 import marcottievents.models.club as mc
 from .workflows import WorkflowBase
+from .cache import KeySet, LineupCache
+from .ledger import CheckpointJournal
+from .bulk import BulkWriter, bulk_writer, insert_ignore
+from .utils import records, record_items
 
 
 logger = logging.getLogger(__name__)
@@ -17,314 +22,422 @@ logger = logging.getLogger(__name__)
 class MarcottiLoad(WorkflowBase):
     """
     Load transformed data into database.
+
+    Records of competitions, clubs, venues, personnel, matches, lineups, events and actions are
+    collected as data mappings and saved as ORM objects with the default 'orm' backend.  The
+    'core' backend inserts the mappings as plain rows with Core executemany statements, one per
+    table of a joined-inheritance hierarchy.  The 'copy' backend writes them as plain rows
+    streamed with COPY on PostgreSQL, and falls back to the 'core' backend on other databases.
+
+    If a batch size is set, match events and actions are staged and committed in batches of that
+    many data rows.  Every batch is saved within a savepoint, so that a batch that fails is rolled
+    back and recorded in `failed_batches` without affecting the other batches.
+
+    If checkpoints are enabled, match events and actions are split into chunks per match, and every
+    committed chunk is recorded in a checkpoint journal in the same transaction.  A restarted load
+    of the same data with the same batch size skips the chunks that have been committed.  The
+    checkpoints of a data entity are cleared with :meth:`clear_checkpoints` once it is loaded.
+
+    Records that are already in the database are skipped.  They are identified by natural keys of
+    model fields, and key fields without a value match only records in which the field is NULL:
+
+    * competitions: (name, level, country_id) or (name, level, confederation)
+    * clubs: (name, country_id)
+    * venues: (name, city, country_id)
+    * league matches: (competition_id, season_id, matchday, home_team_id, away_team_id)
+    * group matches: (competition_id, season_id, group_round, group, matchday, home_team_id,
+      away_team_id)
+    * knockout matches: (competition_id, season_id, ko_round, matchday, home_team_id, away_team_id)
+    * match lineups: (match_id, player_id)
     """
+    BACKENDS = ('orm', 'core', 'copy')
+
+    def __init__(self, session, supplier, resolver=None, references=None, backend='orm', batch_size=None,
+                 checkpoint=False):
+        super(MarcottiLoad, self).__init__(session, supplier, resolver=resolver, references=references)
+        if backend not in self.BACKENDS:
+            raise ValueError("Invalid loader backend: {}".format(backend))
+        self.backend = backend
+        if backend == 'core':
+            self.writer = BulkWriter(session)
+        elif backend == 'copy':
+            self.writer = bulk_writer(session)
+        else:
+            self.writer = None
+        self.batch_size = batch_size
+        self.failed_batches = []
+        self.journal = CheckpointJournal(session, self.supplier_id) if checkpoint else None
+
     def record_exists(self, model, **conditions):
         return self.session.query(model).filter_by(**conditions).count() != 0
 
+    def bulk_save(self, model, mappings):
+        """
+        Save data mappings of a data model through the loader backend.
+
+        :param model: Data model class.
+        :param mappings: List of dictionaries keyed by model attribute names.
+        """
+        if self.writer is not None:
+            self.writer.save(model, mappings)
+        else:
+            self.session.bulk_save_objects([model(**mapping) for mapping in mappings])
+
+    def save_batches(self, entity, data_frame, save, seen=None):
+        """
+        Save data rows in batches, and commit every batch.
+
+        Without a batch size, all data rows of a match (or all data rows, without checkpoints) are
+        saved as one batch and errors are raised.  Otherwise every batch is saved within a
+        savepoint; if it fails, the batch is rolled back, the cached remote ID mappings are
+        discarded, and the batch is recorded in `failed_batches` as a (entity, first row, last row,
+        error message) tuple.  Rows are identified by their index labels.
+
+        If a dictionary of staged rows is given, the rows staged by a batch are added to it only
+        when the batch is committed, so that the rows of a failed batch are not skipped later.
+
+        :param entity: Data entity name.
+        :param data_frame: DataFrame of transformed data.
+        :param save: Function that stages a DataFrame of data rows, and returns the staged rows
+                     keyed by match ID if `seen` is given.
+        :param seen: Dictionary of rows staged by previous batches, see :meth:`unique_rows`.
+        """
+        if not self.batch_size and self.journal is None:
+            staged = save(data_frame)
+            self.session.commit()
+            if seen is not None:
+                self.commit_rows(seen, staged)
+            return
+        for match_id, chunk, batch in self.batches(data_frame):
+            first, last = batch.index[0], batch.index[-1]
+            if self.journal is not None and self.journal.completed(entity, match_id, chunk, self.batch_size, batch):
+                logger.info("Skipping committed {} rows {}-{}".format(entity, first, last))
+                continue
+            savepoint = self.session.begin_nested()
+            try:
+                staged = save(batch)
+                savepoint.commit()
+            except Exception as ex:
+                savepoint.rollback()
+                self.resolver.invalidate()
+                if not self.batch_size:
+                    raise
+                logger.exception("Failed to load {} rows {}-{}".format(entity, first, last))
+                self.failed_batches.append((entity, first, last, str(ex)))
+            else:
+                if seen is not None:
+                    self.commit_rows(seen, staged)
+                if self.journal is not None:
+                    self.journal.record(entity, match_id, chunk, self.batch_size, batch)
+            self.session.commit()
+            logger.info("Committed {} rows {}-{}".format(entity, first, last))
+
+    def clear_checkpoints(self, entity):
+        """
+        Clear the checkpoint journal of a data entity after all of its data has been loaded.
+
+        :param entity: Data entity name.
+        """
+        if self.journal is not None:
+            self.journal.clear(entity)
+
+    def batches(self, data_frame):
+        """
+        Split data rows into batches of at most `batch_size` rows.
+
+        If checkpoints are enabled, data rows are grouped by match first, in order of appearance,
+        and batches are numbered within every match.
+
+        :param data_frame: DataFrame of transformed data.
+        :return: Generator of (match ID, batch index, DataFrame) tuples.
+        """
+        size = self.batch_size or max(len(data_frame), 1)
+        if self.journal is None or 'match_id' not in data_frame.columns:
+            groups = [(None, data_frame)]
+        else:
+            groups = ((group['match_id'].iloc[0], group)
+                      for _, group in data_frame.groupby(data_frame['match_id'].map(str), sort=False))
+        for match_id, group in groups:
+            for chunk, start in enumerate(range(0, len(group), size)):
+                yield match_id, chunk, group.iloc[start:start + size]
+
+    def map_mappings(self, model, remote_ids, local_ids):
+        """
+        Create data mappings of mapper records that link the supplier's remote IDs to local IDs,
+        and add them to the remote ID resolver.
+
+        :param model: Mapper model class.
+        :param remote_ids: List of remote IDs.  Empty remote IDs are skipped.
+        :param local_ids: List of local IDs.
+        :return: List of dictionaries keyed by mapper model fields.
+        """
+        mappings = [dict(id=local_id, remote_id=remote_id, supplier_id=self.supplier_id)
+                    for remote_id, local_id in zip(remote_ids, local_ids) if remote_id]
+        self.resolver.extend(model, self.supplier_id,
+                             [(mapping['remote_id'], mapping['id']) for mapping in mappings])
+        return mappings
+
+    def save_map(self, model, remote_ids, local_ids):
+        """
+        Save mapper records that link the supplier's remote IDs to local IDs, and add the mappings
+        to the remote ID resolver.
+
+        Pending records are flushed first, and mapper records that are already in the database
+        are skipped by the insert statement.
+
+        :param model: Mapper model class.
+        :param remote_ids: List of remote IDs.  Empty remote IDs are skipped.
+        :param local_ids: List of local IDs.
+        """
+        self.session.flush()
+        insert_ignore(self.session, model, self.map_mappings(model, remote_ids, local_ids))
+
+    def add_references(self, key_set, records):
+        """
+        Add records of a validation table to the session, and add their keys and IDs to the key
+        set of the reference data cache.
+
+        :param key_set: :class:`KeySet` of the validation table.
+        :param records: List of data model objects.
+        """
+        self.session.add_all(records)
+        self.session.flush()
+        for record in records:
+            key_set.add(tuple(getattr(record, field) for field in key_set.fields), record.id)
+
     def suppliers(self, data_frame):
-        supplier_records = [mcs.Suppliers(**data_row) for idx, data_row in data_frame.iterrows()
-                            if not self.record_exists(mcs.Suppliers, name=data_row['name'])]
+        supplier_keys = KeySet(self.session, mcs.Suppliers, ['name'])
+        supplier_records = [mcs.Suppliers(**data_row) for data_row in records(supplier_keys.missing(data_frame))]
         self.session.add_all(supplier_records)
         self.session.commit()
 
     def years(self, data_frame):
-        year_records = [mco.Years(**data_row) for idx, data_row in data_frame.iterrows()
-                        if not self.record_exists(mco.Years, yr=data_row['yr'])]
+        year_keys = KeySet(self.session, mco.Years, ['yr'])
+        year_records = [mco.Years(**data_row) for data_row in records(year_keys.missing(data_frame))]
         self.session.add_all(year_records)
         self.session.commit()
 
     def seasons(self, data_frame):
         season_records = []
-        map_records = []
-        for idx, row in data_frame.iterrows():
-            if 'name' not in row:
-                if row['start_year'] == row['end_year']:
-                    yr_obj = self.session.query(mco.Years).filter_by(yr=row['start_year']).one()
-                    if not self.record_exists(mco.Seasons, start_year_id=yr_obj.id, end_year_id=yr_obj.id):
-                        season_records.append(mco.Seasons(start_year=yr_obj, end_year=yr_obj))
-                else:
-                    start_yr_obj = self.session.query(mco.Years).filter_by(yr=row['start_year']).one()
-                    end_yr_obj = self.session.query(mco.Years).filter_by(yr=row['end_year']).one()
-                    if not self.record_exists(mco.Seasons, start_year_id=start_yr_obj.id, end_year_id=end_yr_obj.id):
-                        season_records.append(mco.Seasons(start_year=start_yr_obj, end_year=end_yr_obj))
-                self.session.add_all(season_records)
-            else:
-                if not self.record_exists(mcs.SeasonMap, remote_id=row['remote_id'], supplier_id=self.supplier_id):
-                    map_records.append(mcs.SeasonMap(id=self.get_id(mco.Seasons, name=row['name']),
-                                                     remote_id=row['remote_id'],
-                                                     supplier_id=self.supplier_id))
-                self.session.add_all(map_records)
+        if 'name' not in data_frame.columns:
+            year_ids = {rec.yr: rec.id for rec in self.session.query(mco.Years)}
+            id_frame = data_frame.assign(start_year_id=data_frame['start_year'].map(year_ids),
+                                         end_year_id=data_frame['end_year'].map(year_ids))
+            season_keys = KeySet(self.session, mco.Seasons, ['start_year_id', 'end_year_id'])
+            for row in records(season_keys.missing(id_frame), ['start_year_id', 'end_year_id']):
+                season_records.append(mco.Seasons(start_year_id=int(row['start_year_id']),
+                                                  end_year_id=int(row['end_year_id'])))
+            self.session.add_all(season_records)
+            self.season_names.invalidate()
+        else:
+            remote_ids = []
+            local_ids = []
+            self.resolver.prefetch(mcs.SeasonMap, data_frame['remote_id'], self.supplier_id)
+            for row in records(data_frame.drop_duplicates('remote_id'), ['remote_id', 'name']):
+                if self.resolver.get(mcs.SeasonMap, row['remote_id'], self.supplier_id) is None:
+                    remote_ids.append(row['remote_id'])
+                    local_ids.append(self.season_names.get(row['name']))
+            self.save_map(mcs.SeasonMap, remote_ids, local_ids)
         self.session.commit()
 
     def countries(self, data_frame):
         remote_ids = []
         country_records = []
         fields = ['name', 'code', 'confederation']
-        for idx, row in data_frame.iterrows():
+        country_keys = self.references.keys(mco.Countries, ['name'])
+        for row in records(country_keys.missing(data_frame), fields + ['remote_id']):
             country_dict = {field: row[field] for field in fields if row[field]}
-            if not self.record_exists(mco.Countries, name=row['name']):
-                country_records.append(mco.Countries(**country_dict))
-                remote_ids.append(row['remote_id'])
-        self.session.add_all(country_records)
-        self.session.commit()
-        map_records = [mcs.CountryMap(id=country_record.id, remote_id=remote_id, supplier_id=self.supplier_id)
-                       for remote_id, country_record in zip(remote_ids, country_records) if remote_id]
-        self.session.add_all(map_records)
+            country_records.append(mco.Countries(**country_dict))
+            remote_ids.append(row['remote_id'])
+        self.add_references(country_keys, country_records)
+        self.save_map(mcs.CountryMap, remote_ids, [country_record.id for country_record in country_records])
         self.session.commit()
 
     def competitions(self, data_frame):
         remote_ids = []
         local_ids = []
-        comp_records = []
-        for idx, row in data_frame.iterrows():
-            if 'country_id' in data_frame.columns:
-                fields = ['name', 'level', 'country_id']
-                comp_dict = {field: row[field] for field in fields if row[field]}
-                if not self.record_exists(mco.DomesticCompetitions, **comp_dict):
-                    comp_dict.update(id=uuid.uuid4())
-                    comp_records.append(mco.DomesticCompetitions(**comp_dict))
-                    remote_ids.append(row['remote_id'])
-                    local_ids.append(comp_dict['id'])
-            elif 'confederation' in data_frame.columns:
-                fields = ['name', 'level', 'confederation']
-                comp_dict = {field: row[field] for field in fields if row[field]}
-                if not self.record_exists(mco.InternationalCompetitions, **comp_dict):
-                    comp_dict.update(id=uuid.uuid4())
-                    comp_records.append(mco.InternationalCompetitions(**comp_dict))
-                    remote_ids.append(row['remote_id'])
-                    local_ids.append(comp_dict['id'])
-        self.session.bulk_save_objects(comp_records)
-        map_records = [mcs.CompetitionMap(id=local_id, remote_id=remote_id, supplier_id=self.supplier_id)
-                       for remote_id, local_id in zip(remote_ids, local_ids) if remote_id]
-        self.session.bulk_save_objects(map_records)
+        comp_mappings = []
+        if 'country_id' in data_frame.columns:
+            model = mco.DomesticCompetitions
+            fields = ['name', 'level', 'country_id']
+        elif 'confederation' in data_frame.columns:
+            model = mco.InternationalCompetitions
+            fields = ['name', 'level', 'confederation']
+        else:
+            return
+        comp_keys = KeySet(self.session, model, fields)
+        for row in records(comp_keys.missing(data_frame), fields + ['remote_id']):
+            comp_dict = {field: row[field] for field in fields if row[field]}
+            comp_dict.update(id=uuid.uuid4())
+            comp_mappings.append(comp_dict)
+            remote_ids.append(row['remote_id'])
+            local_ids.append(comp_dict['id'])
+        self.bulk_save(model, comp_mappings)
+        self.save_map(mcs.CompetitionMap, remote_ids, local_ids)
         self.session.commit()
 
     def clubs(self, data_frame):
         remote_ids = []
         local_ids = []
-        club_records = []
+        club_mappings = []
         fields = ['short_name', 'name', 'country_id']
-        for idx, row in data_frame.iterrows():
+        club_keys = KeySet(self.session, mc.Clubs, ['name', 'country_id'])
+        for row in records(club_keys.missing(data_frame), fields + ['remote_id']):
             club_dict = {field: row[field] for field in fields if row[field]}
-            if not self.record_exists(mc.Clubs, **club_dict):
-                club_dict.update(id=uuid.uuid4())
-                club_records.append(mc.Clubs(**club_dict))
-                remote_ids.append(row['remote_id'])
-                local_ids.append(club_dict['id'])
-        self.session.bulk_save_objects(club_records)
-        map_records = [mc.ClubMap(id=local_id, remote_id=remote_id, supplier_id=self.supplier_id)
-                       for remote_id, local_id in zip(remote_ids, local_ids) if remote_id]
-        self.session.bulk_save_objects(map_records)
+            club_dict.update(id=uuid.uuid4())
+            club_mappings.append(club_dict)
+            remote_ids.append(row['remote_id'])
+            local_ids.append(club_dict['id'])
+        self.bulk_save(mc.Clubs, club_mappings)
+        self.save_map(mc.ClubMap, remote_ids, local_ids)
         self.session.commit()
 
     def venues(self, data_frame):
         remote_ids = []
         local_ids = []
-        venue_records = []
-        history_records = []
+        venue_mappings = []
+        history_mappings = []
         fields = ['name', 'city', 'region', 'latitude', 'longitude', 'altitude', 'country_id', 'timezone_id']
         history_fields = ['eff_date', 'length', 'width', 'capacity', 'seats', 'surface_id']
-        for idx, row in data_frame.iterrows():
+        venue_keys = KeySet(self.session, mco.Venues, ['name', 'city', 'country_id'])
+        for row in records(venue_keys.missing(data_frame), fields + history_fields + ['remote_id']):
             venue_dict = {field: row[field] for field in fields if row[field]}
-            if not self.record_exists(mco.Venues, **venue_dict):
-                venue_dict.update(id=uuid.uuid4())
-                venue_records.append(mco.Venues(**venue_dict))
-                history_dict = {field: row[field] for field in history_fields if row[field]}
-                history_records.append(mco.VenueHistory(venue_id=venue_dict['id'], **history_dict))
-                remote_ids.append(row['remote_id'])
-                local_ids.append(venue_dict['id'])
-        self.session.bulk_save_objects(venue_records)
-        self.session.bulk_save_objects(history_records)
-
-        map_records = [mcs.VenueMap(id=local_id, remote_id=remote_id, supplier_id=self.supplier_id)
-                       for remote_id, local_id in zip(remote_ids, local_ids) if remote_id]
-        self.session.bulk_save_objects(map_records)
+            venue_dict.update(id=uuid.uuid4())
+            venue_mappings.append(venue_dict)
+            history_dict = {field: row[field] for field in history_fields if row[field]}
+            history_mappings.append(dict(venue_id=venue_dict['id'], **history_dict))
+            remote_ids.append(row['remote_id'])
+            local_ids.append(venue_dict['id'])
+        self.bulk_save(mco.Venues, venue_mappings)
+        self.bulk_save(mco.VenueHistory, history_mappings)
+
+        self.save_map(mcs.VenueMap, remote_ids, local_ids)
         self.session.commit()
 
     def surfaces(self, data_frame):
-        surface_records = [mco.Surfaces(**row) for indx, row in data_frame.iterrows()
-                           if not self.record_exists(mco.Surfaces, description=row['description'])]
-        self.session.add_all(surface_records)
+        surface_keys = self.references.keys(mco.Surfaces, ['description'])
+        surface_records = [mco.Surfaces(**row) for row in records(surface_keys.missing(data_frame))]
+        self.add_references(surface_keys, surface_records)
         self.session.commit()
 
     def timezones(self, data_frame):
-        tz_records = [mco.Timezones(**row) for indx, row in data_frame.iterrows()
-                      if not self.record_exists(mco.Timezones, name=row['name'])]
-        self.session.add_all(tz_records)
+        tz_keys = self.references.keys(mco.Timezones, ['name'])
+        tz_records = [mco.Timezones(**row) for row in records(tz_keys.missing(data_frame))]
+        self.add_references(tz_keys, tz_records)
         self.session.commit()
 
+    def persons(self, model, map_model, data_frame, fields, extra_fields=()):
+        """
+        Load person records (players, managers, referees) and their supplier mapper records.
+
+        New persons are inserted, mapped persons whose fields have changed are updated with one
+        batched statement per table, and remote IDs of new or existing persons are mapped.  The
+        indexed full names of inserted and updated persons are composed here, as bulk statements
+        bypass the ORM events that maintain them.
+
+        Persons are reconciled with the person index of the reference cache, which is retrieved
+        once and kept across workflows, e.g. for all chunks of a stream.
+
+        :param model: Person data model class.
+        :param map_model: Mapper model class of the person data model.
+        :param data_frame: DataFrame of transformed person data.
+        :param fields: List of person fields in the data feed.
+        :param extra_fields: Other fields in the data feed that are kept in the data rows.
+        :return: List of dictionaries of unique person data rows.
+        """
+        person_set = set(record_items(data_frame, fields + list(extra_fields) + ['remote_id']))
+        person_dicts = [dict(elements) for elements in person_set]
+        logger.info("{} {} in data feed".format(len(person_dicts), model.__tablename__))
+        self.resolver.prefetch(map_model, [person_dict.get('remote_id') for person_dict in person_dicts],
+                               self.supplier_id)
+        reconciler = self.references.reconciler(model, fields)
+        inserts, updates, maps = reconciler.classify(
+            person_dicts, lambda remote_id: self.resolver.get(map_model, remote_id, self.supplier_id))
+        for values in inserts + updates:
+            values['search_name'] = mcp.compose_full_name(
+                values.get('first_name'), values.get('last_name'),
+                **{field: values.get(field) for field in ['known_first_name', 'middle_name', 'nick_name', 'order']})
+        if updates:
+            self.session.bulk_update_mappings(model, updates)
+        logger.info("{} {} records ingested, {} updated".format(len(inserts), model.__tablename__, len(updates)))
+        self.bulk_save(model, inserts)
+        self.save_map(map_model, [remote_id for remote_id, _ in maps], [local_id for _, local_id in maps])
+        self.session.commit()
+        return person_dicts
+
     def players(self, data_frame):
-        player_set = set()
-        player_records = []
-        remote_countryids = []
-        remote_ids = []
-        local_ids = []
         fields = ['known_first_name', 'first_name', 'middle_name', 'last_name', 'second_last_name',
-                  'nick_name', 'birth_date', 'order', 'country_id', 'position_id', 'remote_id',
-                  'remote_country_id']
-
-        for _, row in data_frame.iterrows():
-            player_set.add(tuple([(field, row[field]) for field in fields
-                                  if field in row and row[field] is not None]))
-        logger.info("{} players in data feed".format(len(player_set)))
-        for elements in player_set:
-            player_dict = dict(elements)
-            remote_id = player_dict.pop('remote_id')
-            remote_country_id = player_dict.pop('remote_country_id', None)
-            if not self.record_exists(mcs.PlayerMap, remote_id=remote_id):
-                if not self.record_exists(mcp.Players, **player_dict):
-                    player_dict.update(id=uuid.uuid4(), person_id=uuid.uuid4())
-                    player_records.append(mcp.Players(**player_dict))
-                    local_ids.append(player_dict['id'])
-                    remote_ids.append(remote_id)
-                    remote_countryids.append(remote_country_id)
-                else:
-                    player_id = self.session.query(mcp.Players).filter_by(**player_dict).one().id
-                    local_ids.append(player_id)
-                    remote_ids.append(remote_id)
-            else:
-                player_id = self.session.query(mcs.PlayerMap).filter_by(remote_id=remote_id).one().id
-                if not self.record_exists(mcp.Players, **player_dict):
-                    updated_records = self.session.query(mcp.Players).\
-                        filter(mcp.Players.person_id == mcp.Persons.person_id).\
-                        filter(mcp.Players.id == player_id)
-                    for rec in updated_records:
-                        for field, value in player_dict.items():
-                            setattr(rec, field, value)
-        if self.session.dirty:
-            self.session.commit()
-
-        logger.info("{} player records ingested".format(len(player_records)))
-        self.session.bulk_save_objects(player_records)
-        map_records = [mcs.PlayerMap(id=local_id, remote_id=remote_id, supplier_id=self.supplier_id)
-                       for remote_id, local_id in zip(remote_ids, local_ids) if remote_id]
-        self.session.bulk_save_objects(map_records)
+                  'nick_name', 'birth_date', 'order', 'country_id', 'position_id']
+        player_dicts = self.persons(mcp.Players, mcs.PlayerMap, data_frame, fields,
+                                    extra_fields=['remote_country_id'])
+
+        country_maps = {player_dict['remote_country_id']: player_dict['country_id'] for player_dict in player_dicts
+                        if player_dict.get('remote_country_id') and player_dict.get('country_id')}
+        self.resolver.prefetch(mcs.CountryMap, list(country_maps), self.supplier_id)
+        country_maps = {remote_id: country_id for remote_id, country_id in country_maps.items()
+                        if self.resolver.get(mcs.CountryMap, remote_id, self.supplier_id) is None}
+        self.save_map(mcs.CountryMap, list(country_maps), list(country_maps.values()))
         self.session.commit()
 
-        for remote_id, player_record in zip(remote_countryids, player_records):
-            if remote_id and not self.record_exists(mcs.CountryMap, remote_id=remote_id,
-                                                    supplier_id=self.supplier_id):
-                self.session.add(mcs.CountryMap(id=player_record.country_id, remote_id=remote_id,
-                                                supplier_id=self.supplier_id))
-                self.session.commit()
-
     def managers(self, data_frame):
-        manager_records = []
-        remote_ids = []
-        local_ids = []
         fields = ['known_first_name', 'first_name', 'middle_name', 'last_name', 'second_last_name',
                   'nick_name', 'birth_date', 'order', 'country_id']
-        for indx, row in data_frame.iterrows():
-            manager_dict = {field: row[field] for field in fields if field in row and row[field]}
-            if not self.record_exists(mcs.ManagerMap, remote_id=row['remote_id']):
-                if not self.record_exists(mcp.Managers, **manager_dict):
-                    manager_dict.update(id=uuid.uuid4(), person_id=uuid.uuid4())
-                    manager_records.append(mcp.Managers(**manager_dict))
-                    local_ids.append(manager_dict['id'])
-                    remote_ids.append(row['remote_id'])
-                else:
-                    manager_id = self.session.query(mcp.Managers).filter_by(**manager_dict).one().id
-                    local_ids.append(manager_id)
-                    remote_ids.append(row['remote_id'])
-            else:
-                manager_id = self.session.query(mcs.ManagerMap).filter_by(remote_id=row['remote_id']).one().id
-                if not self.record_exists(mcp.Managers, **manager_dict):
-                    updated_records = self.session.query(mcp.Managers).\
-                        filter(mcp.Managers.person_id == mcp.Persons.person_id).\
-                        filter(mcp.Managers.id == manager_id)
-                    for rec in updated_records:
-                        for field, value in manager_dict.items():
-                            setattr(rec, field, value)
-        if self.session.dirty:
-            self.session.commit()
-
-        self.session.bulk_save_objects(manager_records)
-        map_records = [mcs.ManagerMap(id=local_id, remote_id=remote_id, supplier_id=self.supplier_id)
-                       for remote_id, local_id in zip(remote_ids, local_ids) if remote_id]
-        self.session.bulk_save_objects(map_records)
-        self.session.commit()
+        self.persons(mcp.Managers, mcs.ManagerMap, data_frame, fields)
 
     def referees(self, data_frame):
-        referee_records = []
-        remote_ids = []
-        local_ids = []
         fields = ['known_first_name', 'first_name', 'middle_name', 'last_name', 'second_last_name',
                   'nick_name', 'birth_date', 'order', 'country_id']
-        for indx, row in data_frame.iterrows():
-            referee_dict = {field: row[field] for field in fields if field in row and row[field]}
-            if not self.record_exists(mcs.RefereeMap, remote_id=row['remote_id']):
-                if not self.record_exists(mcp.Referees, **referee_dict):
-                    referee_dict.update(id=uuid.uuid4(), person_id=uuid.uuid4())
-                    referee_records.append(mcp.Referees(**referee_dict))
-                    remote_ids.append(row['remote_id'])
-                    local_ids.append(referee_dict['id'])
-                else:
-                    referee_id = self.session.query(mcp.Referees).filter_by(**referee_dict).one().id
-                    local_ids.append(referee_id)
-                    remote_ids.append(row['remote_id'])
-            else:
-                referee_id = self.session.query(mcs.RefereeMap).filter_by(remote_id=row['remote_id']).one().id
-                if not self.record_exists(mcp.Referees, **referee_dict):
-                    updated_records = self.session.query(mcp.Referees). \
-                        filter(mcp.Referees.person_id == mcp.Persons.person_id). \
-                        filter(mcp.Referees.id == referee_id)
-                    for rec in updated_records:
-                        for field, value in referee_dict.items():
-                            setattr(rec, field, value)
-        if self.session.dirty:
-            self.session.commit()
-
-        self.session.bulk_save_objects(referee_records)
-        map_records = [mcs.RefereeMap(id=local_id, remote_id=remote_id, supplier_id=self.supplier_id)
-                       for remote_id, local_id in zip(remote_ids, local_ids) if remote_id]
-        self.session.bulk_save_objects(map_records)
-        self.session.commit()
+        self.persons(mcp.Referees, mcs.RefereeMap, data_frame, fields)
 
     def positions(self, data_frame):
         position_record = []
-        for indx, row in data_frame.iterrows():
+        remote_ids = []
+        local_ids = []
+        position_keys = self.references.keys(mcp.Positions, ['name'])
+        self.resolver.prefetch(mcs.PositionMap, data_frame['remote_id'], self.supplier_id)
+        for row in records(data_frame, ['remote_id', 'name', 'type']):
             if row['remote_id'] and self.supplier_id:
-                if not self.record_exists(mcs.PositionMap, remote_id=row['remote_id'], supplier_id=self.supplier_id):
-                    position_record.append(mcs.PositionMap(
-                        id=self.get_id(mcp.Positions, name=row['name']),
-                        remote_id=row['remote_id'], supplier_id=self.supplier_id))
+                if self.resolver.get(mcs.PositionMap, row['remote_id'], self.supplier_id) is None:
+                    remote_ids.append(row['remote_id'])
+                    local_ids.append(position_keys.get(position_keys.key(row)))
             else:
-                if not self.record_exists(mcp.Positions, name=row['name']):
+                if position_keys.key(row) not in position_keys:
                     position_record.append(mcp.Positions(name=row['name'], type=row['type']))
-        self.session.add_all(position_record)
+                    position_keys.add(position_keys.key(row))
+        self.add_references(position_keys, position_record)
+        self.save_map(mcs.PositionMap, remote_ids, local_ids)
         self.session.commit()
 
     def league_matches(self, data_frame):
-        condition_records = []
-        match_records = []
+        condition_mappings = []
+        match_mappings = []
         remote_ids = []
         local_ids = []
         fields = ['match_date', 'competition_id', 'season_id', 'venue_id', 'home_team_id', 'away_team_id',
                   'home_manager_id', 'away_manager_id', 'referee_id', 'attendance', 'matchday']
         condition_fields = ['kickoff_time', 'kickoff_temp', 'kickoff_humidity',
                             'kickoff_weather', 'halftime_weather', 'fulltime_weather']
-        for idx, row in data_frame.iterrows():
-            match_dict = {field: row[field] for field in fields if field in row and row[field] is not None}
+        match_keys = KeySet(self.session, mc.ClubLeagueMatches,
+                            ['competition_id', 'season_id', 'matchday', 'home_team_id', 'away_team_id'])
+        for row in records(match_keys.missing(data_frame), fields + condition_fields + ['remote_id']):
+            match_dict = {field: value for field, value in row.items() if field in fields and value is not None}
             condition_dict = {field: row[field] for field in condition_fields
                               if field in row and row[field] is not None}
-            if not self.record_exists(mc.ClubLeagueMatches, **match_dict):
-                match_dict.update(id=uuid.uuid4())
-                match_records.append(mc.ClubLeagueMatches(**match_dict))
-                condition_records.append(mcm.MatchConditions(id=match_dict['id'], **condition_dict))
-                remote_ids.append(row['remote_id'])
-                local_ids.append(match_dict['id'])
-
-        self.session.bulk_save_objects(match_records)
-        self.session.bulk_save_objects(condition_records)
-
-        map_records = [mcs.MatchMap(id=local_id, remote_id=remote_id, supplier_id=self.supplier_id)
-                       for remote_id, local_id in zip(remote_ids, local_ids) if remote_id]
-        self.session.bulk_save_objects(map_records)
+            match_dict.update(id=uuid.uuid4())
+            match_mappings.append(match_dict)
+            condition_mappings.append(dict(id=match_dict['id'], **condition_dict))
+            remote_ids.append(row['remote_id'])
+            local_ids.append(match_dict['id'])
+
+        self.bulk_save(mc.ClubLeagueMatches, match_mappings)
+        self.bulk_save(mcm.MatchConditions, condition_mappings)
+
+        self.save_map(mcs.MatchMap, remote_ids, local_ids)
         self.session.commit()
 
     def group_matches(self, data_frame):
-        condition_records = []
-        match_records = []
+        condition_mappings = []
+        match_mappings = []
         remote_ids = []
         local_ids = []
         fields = ['match_date', 'competition_id', 'season_id', 'venue_id', 'home_team_id', 'away_team_id',
@@ -332,28 +445,28 @@ class MarcottiLoad(WorkflowBase):
                   'group_round', 'group']
         condition_fields = ['kickoff_time', 'kickoff_temp', 'kickoff_humidity',
                             'kickoff_weather', 'halftime_weather', 'fulltime_weather']
-        for idx, row in data_frame.iterrows():
-            match_dict = {field: row[field] for field in fields if field in row and row[field] is not None}
+        match_keys = KeySet(self.session, mc.ClubGroupMatches,
+                            ['competition_id', 'season_id', 'group_round', 'group', 'matchday',
+                             'home_team_id', 'away_team_id'])
+        for row in records(match_keys.missing(data_frame), fields + condition_fields + ['remote_id']):
+            match_dict = {field: value for field, value in row.items() if field in fields and value is not None}
             condition_dict = {field: row[field] for field in condition_fields
                               if field in row and row[field] is not None}
-            if not self.record_exists(mc.ClubGroupMatches, **match_dict):
-                match_dict.update(id=uuid.uuid4())
-                match_records.append(mc.ClubGroupMatches(**match_dict))
-                condition_records.append(mcm.MatchConditions(id=match_dict['id'], **condition_dict))
-                remote_ids.append(row['remote_id'])
-                local_ids.append(match_dict['id'])
-
-        self.session.bulk_save_objects(match_records)
-        self.session.bulk_save_objects(condition_records)
-
-        map_records = [mcs.MatchMap(id=local_id, remote_id=remote_id, supplier_id=self.supplier_id)
-                       for remote_id, local_id in zip(remote_ids, local_ids) if remote_id]
-        self.session.bulk_save_objects(map_records)
+            match_dict.update(id=uuid.uuid4())
+            match_mappings.append(match_dict)
+            condition_mappings.append(dict(id=match_dict['id'], **condition_dict))
+            remote_ids.append(row['remote_id'])
+            local_ids.append(match_dict['id'])
+
+        self.bulk_save(mc.ClubGroupMatches, match_mappings)
+        self.bulk_save(mcm.MatchConditions, condition_mappings)
+
+        self.save_map(mcs.MatchMap, remote_ids, local_ids)
         self.session.commit()
 
     def knockout_matches(self, data_frame):
-        condition_records = []
-        match_records = []
+        condition_mappings = []
+        match_mappings = []
         remote_ids = []
         local_ids = []
         fields = ['match_date', 'competition_id', 'season_id', 'venue_id', 'home_team_id', 'away_team_id',
@@ -361,53 +474,100 @@ class MarcottiLoad(WorkflowBase):
                   'extra_time']
         condition_fields = ['kickoff_time', 'kickoff_temp', 'kickoff_humidity',
                             'kickoff_weather', 'halftime_weather', 'fulltime_weather']
-        for idx, row in data_frame.iterrows():
-            match_dict = {field: row[field] for field in fields if field in row and row[field] is not None}
+        match_keys = KeySet(self.session, mc.ClubKnockoutMatches,
+                            ['competition_id', 'season_id', 'ko_round', 'matchday', 'home_team_id', 'away_team_id'])
+        for row in records(match_keys.missing(data_frame), fields + condition_fields + ['remote_id']):
+            match_dict = {field: value for field, value in row.items() if field in fields and value is not None}
             condition_dict = {field: row[field] for field in condition_fields
                               if field in row and row[field] is not None}
-            if not self.record_exists(mc.ClubKnockoutMatches, **match_dict):
-                match_dict.update(id=uuid.uuid4())
-                match_records.append(mc.ClubKnockoutMatches(**match_dict))
-                condition_records.append(mcm.MatchConditions(id=match_dict['id'], **condition_dict))
-                remote_ids.append(row['remote_id'])
-                local_ids.append(match_dict['id'])
-
-        self.session.bulk_save_objects(match_records)
-        self.session.bulk_save_objects(condition_records)
-
-        map_records = [mcs.MatchMap(id=local_id, remote_id=remote_id, supplier_id=self.supplier_id)
-                       for remote_id, local_id in zip(remote_ids, local_ids) if remote_id]
-        self.session.bulk_save_objects(map_records)
+            match_dict.update(id=uuid.uuid4())
+            match_mappings.append(match_dict)
+            condition_mappings.append(dict(id=match_dict['id'], **condition_dict))
+            remote_ids.append(row['remote_id'])
+            local_ids.append(match_dict['id'])
+
+        self.bulk_save(mc.ClubKnockoutMatches, match_mappings)
+        self.bulk_save(mcm.MatchConditions, condition_mappings)
+
+        self.save_map(mcs.MatchMap, remote_ids, local_ids)
         self.session.commit()
 
     def match_lineups(self, data_frame):
-        lineup_records = []
+        lineup_mappings = []
         fields = ['match_id', 'player_id', 'team_id', 'position_id', 'is_starting', 'is_captain', 'number']
-        for idx, row in data_frame.iterrows():
-            if not row['player_id']:
-                continue
-            lineup_dict = {field: row[field] for field in fields if row[field] is not None}
-            if not self.record_exists(mc.ClubMatchLineups, **lineup_dict):
-                lineup_dict.update(id=uuid.uuid4())
-                lineup_records.append(mc.ClubMatchLineups(**lineup_dict))
-        self.session.add_all(lineup_records)
+        lineup_keys = KeySet(self.session, mc.ClubMatchLineups, ['match_id', 'player_id'])
+        for row in records(lineup_keys.missing(data_frame[data_frame['player_id'].notnull()]), fields):
+            lineup_dict = {field: value for field, value in row.items() if value is not None}
+            lineup_dict.update(id=uuid.uuid4())
+            lineup_mappings.append(lineup_dict)
+        self.bulk_save(mc.ClubMatchLineups, lineup_mappings)
         self.session.commit()
 
     def modifiers(self, data_frame):
-        mod_records = [mce.Modifiers(**row) for indx, row in data_frame.iterrows()
-                       if not self.record_exists(mce.Modifiers, type=row['type'])]
+        modifier_keys = KeySet(self.session, mce.Modifiers, ['type'])
+        mod_records = [mce.Modifiers(**row) for row in records(modifier_keys.missing(data_frame))]
         self.session.add_all(mod_records)
         self.session.commit()
 
+    @staticmethod
+    def unique_rows(data_frame, fields, seen):
+        """
+        Select the distinct data rows of a batch that have not been staged by previous batches of
+        the same match.
+
+        Staged rows are kept per match, and only for the matches of the latest batch, so data rows
+        are expected in match order.  The dictionary of staged rows is not changed; the rows of
+        the batch are added to it by :meth:`commit_rows` once the batch is committed.
+
+        :param data_frame: DataFrame of transformed data.
+        :param fields: List of fields.
+        :param seen: Dictionary of sets of rows staged by previous batches, keyed by match ID.
+        :return: Set of tuples of (field, value) pairs, and dictionary of sets of the rows staged
+                 by this batch keyed by match ID.
+        """
+        match_ids = data_frame['match_id'].tolist() if 'match_id' in data_frame.columns \
+            else [None] * len(data_frame)
+        staged = {}
+        for match_id, row in izip(match_ids, record_items(data_frame, fields)):
+            rows = staged.setdefault(match_id, set())
+            if row not in seen.get(match_id, ()):
+                rows.add(row)
+        return set().union(*staged.values()), staged
+
+    @staticmethod
+    def commit_rows(seen, staged):
+        """
+        Add the rows staged by a committed batch to the rows staged by previous batches, and keep
+        only the matches of the batch.
+
+        :param seen: Dictionary of sets of rows staged by previous batches, keyed by match ID.
+        :param staged: Dictionary of sets of rows staged by the batch, keyed by match ID.
+        """
+        for match_id in list(seen):
+            if match_id not in staged:
+                del seen[match_id]
+        for match_id, rows in staged.items():
+            seen.setdefault(match_id, set()).update(rows)
+
     def events(self, data_frame):
-        event_set = set()
-        event_records = []
+        seen = {}
+        if 'match_id' in data_frame.columns:
+            data_frame = data_frame.sort_values('match_id', kind='mergesort')
+        self.save_batches('events', data_frame, lambda batch: self.stage_events(batch, seen), seen)
+
+    def stage_events(self, data_frame, seen):
+        """
+        Stage match events and event mapper records of a batch of data rows.
+
+        :param data_frame: DataFrame of transformed match events.
+        :param seen: Dictionary of events staged by previous batches, see :meth:`unique_rows`.
+        :return: Dictionary of events staged by this batch.
+        """
+        event_mappings = {mce.MatchEvents: [], mc.ClubMatchEvents: []}
         remote_ids = []
         local_ids = []
         fields = ['timestamp', 'period', 'period_secs', 'x', 'y', 'match_id', 'team_id', 'remote_id']
-        for _, row in data_frame.iterrows():
-            event_set.add(tuple([(field, row[field]) for field in fields
-                                 if field in row and row[field] is not None]))
+        event_set, staged = self.unique_rows(data_frame, fields, seen)
         logger.info("{} unique events".format(len(event_set)))
         for indx, elements in enumerate(event_set):
             if indx and indx % 100 == 0:
@@ -417,34 +577,53 @@ class MarcottiLoad(WorkflowBase):
             if 'team_id' not in event_dict:
                 # if not self.record_exists(mce.MatchEvents, **event_dict):
                 event_dict.update(id=uuid.uuid4())
-                event_records.append(mce.MatchEvents(**event_dict))
+                event_mappings[mce.MatchEvents].append(event_dict)
                 remote_ids.append(remote_id)
                 local_ids.append(event_dict['id'])
             else:
                 # if not self.record_exists(mc.ClubMatchEvents, **event_dict):
                 event_dict.update(id=uuid.uuid4())
-                event_records.append(mc.ClubMatchEvents(**event_dict))
+                event_mappings[mc.ClubMatchEvents].append(event_dict)
                 remote_ids.append(remote_id)
                 local_ids.append(event_dict['id'])
-        self.session.bulk_save_objects(event_records)
+        self.bulk_save(mce.MatchEvents, event_mappings[mce.MatchEvents])
+        self.bulk_save(mc.ClubMatchEvents, event_mappings[mc.ClubMatchEvents])
 
-        map_records = [mcs.MatchEventMap(id=local_id, remote_id=remote_id, supplier_id=self.supplier_id)
-                       for remote_id, local_id in zip(remote_ids, local_ids) if remote_id]
-        self.session.bulk_save_objects(map_records)
-        self.session.commit()
+        self.bulk_save(mcs.MatchEventMap, self.map_mappings(mcs.MatchEventMap, remote_ids, local_ids))
+        return staged
 
     def actions(self, data_frame):
-        action_set = set()
-        action_records = []
-        lineup_dict = None
+        seen = {}
+        lineups = LineupCache(self.session)
+        modifiers = {rec.type: rec.id for rec in self.session.query(mce.Modifiers)}
+        if 'match_id' in data_frame.columns:
+            data_frame = data_frame.sort_values('match_id', kind='mergesort')
+        self.save_batches('actions', data_frame,
+                          lambda batch: self.stage_actions(batch, seen, lineups, modifiers), seen)
+
+    def stage_actions(self, data_frame, seen, lineups, modifiers):
+        """
+        Stage match actions and action modifier records of a batch of data rows.
+
+        Data rows are sorted by match, so the lineups of matches that are not in the batch are
+        evicted from the lineup cache.  Modifier types that are not in the database are added to
+        the lookup report, and the actions are saved without a link to the modifier.
+
+        :param data_frame: DataFrame of transformed match actions.
+        :param seen: Dictionary of actions staged by previous batches, see :meth:`unique_rows`.
+        :param lineups: :class:`LineupCache` object.
+        :param modifiers: Dictionary of modifier IDs keyed by ModifierType.
+        :return: Dictionary of actions staged by this batch.
+        """
+        action_mappings = []
         modifier_ids = []
         local_ids = []
+        missing_modifiers = set()
         action_fields = ['event_id', 'type', 'x_end', 'y_end', 'z_end',
                          'is_success', 'match_id', 'player_id', 'modifier_type']
-        for _, row in data_frame.iterrows():
-            action_set.add(tuple([(field, row[field]) for field in action_fields
-                                  if field in row and row[field] is not None]))
+        action_set, staged = self.unique_rows(data_frame, action_fields, seen)
         logger.info("{} unique actions".format(len(action_set)))
+        lineups.retain(data_frame['match_id'] if 'match_id' in data_frame.columns else [])
         for indx, elements in enumerate(action_set):
             if indx and indx % 100 == 0:
                 logger.info("Processing {} actions".format(indx))
@@ -452,28 +631,30 @@ class MarcottiLoad(WorkflowBase):
             match_id = action_dict.pop('match_id')
             player_id = action_dict.pop('player_id', None)
             modifier_type = action_dict.pop('modifier_type', None)
-            if not lineup_dict:
-                records = self.session.query(mcm.MatchLineups).filter_by(match_id=match_id).all()
-                lineup_dict = {rec.player_id: rec.id for rec in records}
             if player_id:
-                action_dict['lineup_id'] = lineup_dict[player_id]
+                action_dict['lineup_id'] = lineups.get(match_id, player_id)
             if modifier_type:
                 try:
-                    modifier_id = self.get_id(mce.Modifiers,
-                                              type=enums.ModifierType.from_string(modifier_type))
+                    modifier_id = modifiers.get(enums.ModifierType.from_string(modifier_type))
                 except ValueError as ex:
                     logger.info(elements)
                     raise ex
+                if modifier_id is None:
+                    missing_modifiers.add(modifier_type)
             else:
                 modifier_id = None
             # if not self.record_exists(mce.MatchActions, **action_dict):
             action_dict.update(id=uuid.uuid4())
-            action_records.append(mce.MatchActions(**action_dict))
-            modifier_ids.append(modifier_id)
-            local_ids.append(action_dict['id'])
-        self.session.bulk_save_objects(action_records)
-
-        modifier_records = [mce.MatchActionModifiers(action_id=local_id, modifier_id=modifier_id)
-                            for modifier_id, local_id in zip(modifier_ids, local_ids)]
-        self.session.bulk_save_objects(modifier_records)
-        self.session.commit()
+            action_mappings.append(action_dict)
+            if modifier_id is not None or not modifier_type:
+                modifier_ids.append(modifier_id)
+                local_ids.append(action_dict['id'])
+        self.bulk_save(mce.MatchActions, action_mappings)
+
+        for modifier_type in sorted(missing_modifiers):
+            rows = data_frame.index[data_frame['modifier_type'] == modifier_type]
+            self.report.add(mce.Modifiers, {'type': modifier_type}, list(rows))
+        modifier_mappings = [dict(action_id=local_id, modifier_id=modifier_id)
+                             for modifier_id, local_id in zip(modifier_ids, local_ids)]
+        self.bulk_save(mce.MatchActionModifiers, modifier_mappings)
+        return staged
@@ -0,0 +1,103 @@
+import uuid
+
+from .utils import null_to_none
+
+
+class PersonReconciler(object):
+    """
+    Reconcile incoming records of persons (players, managers, referees) with the persons of a data
+    model in the database.
+
+    Existing persons are retrieved with one query and indexed by a fingerprint of their names,
+    birth date and country.  Incoming records are then classified into three sets:
+
+    * inserts: persons that are not mapped to the supplier's remote ID and are not in the database,
+    * updates: mapped persons whose fields differ from the database record,
+    * maps: remote IDs that are not mapped yet, with the local IDs of new or existing persons.
+
+    The index is updated with the classified inserts and updates, so that one reconciler serves
+    all batches of records of a load once their inserts and updates are staged.
+    """
+    IDENTITY_FIELDS = ['known_first_name', 'first_name', 'middle_name', 'last_name', 'second_last_name',
+                       'nick_name', 'birth_date', 'country_id']
+
+    def __init__(self, session, model, fields):
+        """
+        :param session: Database session.
+        :param model: Person data model class (Players, Managers, Referees).
+        :param fields: List of model fields that are loaded from the data feed.
+        """
+        self.session = session
+        self.model = model
+        self.fields = list(fields)
+        self.records = None
+        self.fingerprints = None
+
+    def fingerprint(self, record):
+        """
+        Compose normalized identity of a person record.
+
+        Names are compared without case and surrounding or repeated whitespace, and empty values
+        are treated as missing.
+
+        :param record: Dictionary of person fields.
+        :return: Tuple of normalized identity field values.
+        """
+        return tuple(_normalize(record.get(field)) for field in self.IDENTITY_FIELDS)
+
+    def load(self):
+        """
+        Retrieve and index the existing persons of the data model.
+        """
+        columns = [self.model.id, self.model.person_id] + [getattr(self.model, field) for field in self.fields]
+        self.records = {}
+        self.fingerprints = {}
+        for row in self.session.query(*columns).select_from(self.model):
+            record = dict(zip(['id', 'person_id'] + self.fields, row))
+            self.records[record['id']] = record
+            self.fingerprints.setdefault(self.fingerprint(record), record['id'])
+
+    def classify(self, person_dicts, mapped_id):
+        """
+        Classify incoming person records into inserts, updates and remote ID mappings.
+
+        :param person_dicts: List of dictionaries of person fields and 'remote_id'.  Fields with
+                             missing values are ignored.
+        :param mapped_id: Function that returns the local ID of a remote ID, or None if it is not mapped.
+        :return: Tuple of insert mappings, update mappings, and list of (remote ID, local ID) tuples.
+        """
+        if self.records is None:
+            self.load()
+        inserts = []
+        updates = {}
+        maps = []
+        for person_dict in person_dicts:
+            remote_id = null_to_none(person_dict.get('remote_id'))
+            values = {field: null_to_none(person_dict[field]) for field in self.fields if field in person_dict}
+            values = {field: value for field, value in values.items() if value is not None}
+            local_id = mapped_id(remote_id) if remote_id is not None else None
+            if local_id is None:
+                fingerprint = self.fingerprint(values)
+                local_id = self.fingerprints.get(fingerprint)
+                if local_id is None:
+                    values.update(id=uuid.uuid4(), person_id=uuid.uuid4())
+                    inserts.append(values)
+                    self.fingerprints[fingerprint] = local_id = values['id']
+                maps.append((remote_id, local_id))
+            elif local_id in self.records:
+                record = updates.get(local_id, self.records[local_id])
+                if any(record.get(field) != value for field, value in values.items()):
+                    updates[local_id] = dict(record, **values)
+        for values in inserts:
+            self.records[values['id']] = dict(values)
+        for local_id, record in updates.items():
+            self.records[local_id] = record
+            self.fingerprints.setdefault(self.fingerprint(record), local_id)
+        return inserts, [dict(record) for record in updates.values()], maps
+
+
+def _normalize(value):
+    value = null_to_none(value)
+    if isinstance(value, basestring):
+        value = u' '.join(value.split()).lower() or None
+    return value
@@ -0,0 +1,125 @@
+import os
+import logging
+from collections import OrderedDict
+
+
+logger = logging.getLogger(__name__)
+
+
+class LookupReport(object):
+    """
+    Report of the data feed values of a data entity that did not resolve to a unique database
+    record during the transform stage.
+
+    Lookup misses are aggregated by data model, lookup conditions and reason ('missing' if no
+    record matches, 'ambiguous' if more than one record matches), with the number of data rows
+    and the indexes of the data rows that are affected.
+    """
+    FIRST_ROWS = 5
+
+    def __init__(self, entity=None):
+        """
+        :param entity: Data entity name, or None.
+        """
+        self.entity = entity
+        self.entries = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries.values())
+
+    def add(self, model, conditions, rows=(), reason='missing', count=None):
+        """
+        Record a lookup miss.
+
+        :param model: Data model class, or name of data model.
+        :param conditions: Dictionary of lookup conditions.
+        :param rows: List of indexes of the data rows that are affected, empty if unknown.
+        :param reason: 'missing' or 'ambiguous'.
+        :param count: Number of data rows that are affected, by default the number of row indexes
+                      or one if there are none.
+        """
+        name = model if isinstance(model, basestring) else model.__name__
+        key = (name, tuple(sorted(conditions.items())), reason)
+        if key not in self.entries:
+            self.entries[key] = dict(model=name, conditions=dict(conditions), reason=reason, count=0, rows=[])
+        entry = self.entries[key]
+        entry['count'] += count if count is not None else len(rows) or 1
+        entry['rows'].extend(rows)
+
+    def add_column(self, model, field, values, resolved, ambiguous=()):
+        """
+        Record the lookup misses of a column of values.
+
+        :param model: Data model class.
+        :param field: Model field that the values refer to.
+        :param values: Series of looked-up values.
+        :param resolved: Series of resolved local IDs, with None for lookup misses.
+        :param ambiguous: Collection of values that match more than one record.
+        """
+        unresolved = values[values.notnull() & resolved.isnull()]
+        if unresolved.empty:
+            return
+        for value, rows in sorted(unresolved.groupby(unresolved).groups.items()):
+            self.add(model, {field: value}, list(rows), reason='ambiguous' if value in ambiguous else 'missing')
+
+    def extend(self, report, index=None):
+        """
+        Add the entries of another report, e.g. of a partition of the data rows.
+
+        :param report: :class:`LookupReport` object.
+        :param index: Sequence that maps row positions in the other report to row indexes in
+                      this report, or None to keep the row indexes.
+        """
+        for entry in report:
+            rows = entry['rows'] if index is None else [index[row] for row in entry['rows']]
+            self.add(entry['model'], entry['conditions'], rows, reason=entry['reason'], count=entry['count'])
+
+    def rows(self):
+        """
+        Return the indexes of all data rows that are affected by lookup misses.
+
+        :return: Sorted list of row indexes.
+        """
+        return sorted(set(row for entry in self for row in entry['rows']))
+
+    def summary(self):
+        """
+        Compose a summary of the report, one line per entry.
+
+        :return: List of strings.
+        """
+        lines = []
+        for entry in self:
+            lines.append(u"{} {} records in Marcotti database for {}: {} rows, first rows {}".format(
+                entry['model'], 'has no' if entry['reason'] == 'missing' else 'has multiple',
+                entry['conditions'], entry['count'], entry['rows'][:self.FIRST_ROWS]))
+        return lines
+
+    def log(self):
+        """
+        Write the summary of the report to the log.
+        """
+        if self.entries:
+            logger.warning(u"{} unresolved lookups in {} data:\n{}".format(
+                len(self), self.entity, u"\n".join(self.summary())))
+
+    def dead_letter(self, data_frame, directory):
+        """
+        Append the data rows that are affected by lookup misses to a dead-letter CSV file of the
+        data entity, so that they can be reprocessed.
+
+        :param data_frame: DataFrame of extracted data, indexed as in the report.
+        :param directory: Directory of dead-letter files.
+        :return: Path of dead-letter file, or None if no data rows are affected.
+        """
+        rows = self.rows()
+        if not rows:
+            return None
+        path = os.path.join(directory, "{}.csv".format(self.entity))
+        data_frame.loc[rows].to_csv(path, mode='a', header=not os.path.exists(path), index=False,
+                                    encoding='utf-8')
+        logger.info("Wrote {} unresolved {} rows to {}".format(len(rows), self.entity, path))
+        return path
@@ -6,10 +6,12 @@ from marcottievents.models.common.enums import (ConfederationType, ActionType, M
 from marcottievents.models.common.suppliers import (MatchEventMap, MatchMap, CompetitionMap,
                                                     VenueMap, PositionMap, PlayerMap, ManagerMap,
                                                     RefereeMap)
-from marcottievents.models.common.overview import Countries, Timezones, Competitions, Seasons, Venues, Surfaces
+from marcottievents.models.common.overview import Countries, Timezones, Competitions, Venues, Surfaces
 from marcottievents.models.common.personnel import Players, Managers, Referees
 from marcottievents.models.club import Clubs, ClubLeagueMatches, ClubMap
 from .workflows import WorkflowBase
+from .cache import MatchIndex
+from .utils import null_to_none
 
 
 class MarcottiTransform(WorkflowBase):
@@ -32,241 +34,188 @@ class MarcottiTransform(WorkflowBase):
     def competitions(self, data_frame):
         if 'country' in data_frame.columns:
             transformed_field = 'country'
-            lambdafunc = lambda x: pd.Series(self.get_id(Countries, name=x[transformed_field]))
-            id_frame = data_frame.apply(lambdafunc, axis=1)
-            id_frame.columns = ['country_id']
+            id_frame = pd.DataFrame({'country_id': self.resolve_column(Countries, data_frame['country'], 'name')})
         elif 'confed' in data_frame.columns:
             transformed_field = 'confed'
-            lambdafunc = lambda x: pd.Series(ConfederationType.from_string(x[transformed_field]))
-            id_frame = data_frame.apply(lambdafunc, axis=1)
-            id_frame.columns = ['confederation']
+            id_frame = pd.DataFrame({'confederation': self.decode_enum(ConfederationType, data_frame['confed'])})
         else:
             raise KeyError("Cannot insert Competition record: No Country or Confederation data present")
         return data_frame.join(id_frame).drop(transformed_field, axis=1)
 
     def countries(self, data_frame):
-        lambdafunc = lambda x: pd.Series(ConfederationType.from_string(x['confed']))
-        id_frame = data_frame.apply(lambdafunc, axis=1)
-        id_frame.columns = ['confederation']
-        joined_frame = data_frame.join(id_frame).drop('confed', axis=1)
-        return joined_frame
+        return data_frame.assign(confederation=self.decode_enum(ConfederationType, data_frame['confed'])).drop(
+            'confed', axis=1)
 
     def clubs(self, data_frame):
-        if 'country' in data_frame.columns:
-            lambdafunc = lambda x: pd.Series(self.get_id(Countries, name=x['country']))
-            id_frame = data_frame.apply(lambdafunc, axis=1)
-            id_frame.columns = ['country_id']
-        else:
+        if 'country' not in data_frame.columns:
             raise KeyError("Cannot insert Club record: No Country data present")
-        return data_frame.join(id_frame)
+        return data_frame.assign(country_id=self.resolve_column(Countries, data_frame['country'], 'name'))
 
     def venues(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            self.get_id(Countries, name=x['country']),
-            self.get_id(Timezones, name=x['timezone']),
-            self.get_id(Surfaces, description=x['surface']),
-            self.make_date_object(x['config_date'])
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['country_id', 'timezone_id', 'surface_id', 'eff_date']
+        ids_frame = pd.DataFrame({
+            'country_id': self.resolve_column(Countries, data_frame['country'], 'name'),
+            'timezone_id': self.resolve_column(Timezones, data_frame['timezone'], 'name'),
+            'surface_id': self.resolve_column(Surfaces, data_frame['surface'], 'description'),
+            'eff_date': self.parse_dates(data_frame['config_date'])
+        })
         joined_frame = data_frame.join(ids_frame).drop(['country', 'timezone', 'surface', 'config_date'], axis=1)
         new_frame = joined_frame.where((pd.notnull(joined_frame)), None)
         return new_frame
 
     def timezones(self, data_frame):
-        lambdafunc = lambda x: pd.Series(ConfederationType.from_string(x['confed']))
-        id_frame = data_frame.apply(lambdafunc, axis=1)
-        id_frame.columns = ['confederation']
-        joined_frame = data_frame.join(id_frame).drop('confed', axis=1)
-        return joined_frame
+        return data_frame.assign(confederation=self.decode_enum(ConfederationType, data_frame['confed'])).drop(
+            'confed', axis=1)
 
     def positions(self, data_frame):
-        lambdafunc = lambda x: pd.Series(PositionType.from_string(x['position_type']))
-        id_frame = data_frame.apply(lambdafunc, axis=1)
-        id_frame.columns = ['type']
-        joined_frame = data_frame.join(id_frame).drop('position_type', axis=1)
-        return joined_frame
+        return data_frame.assign(type=self.decode_enum(PositionType, data_frame['position_type'])).drop(
+            'position_type', axis=1)
 
     def surfaces(self, data_frame):
-        lambdafunc = lambda x: pd.Series(SurfaceType.from_string(x['surface_type']))
-        id_frame = data_frame.apply(lambdafunc, axis=1)
-        id_frame.columns = ['type']
-        joined_frame = data_frame.join(id_frame).drop('surface_type', axis=1)
-        return joined_frame
+        return data_frame.assign(type=self.decode_enum(SurfaceType, data_frame['surface_type'])).drop(
+            'surface_type', axis=1)
 
     def players(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            self.make_date_object(x['dob']),
-            NameOrderType.from_string(x['name_order'] or 'Western'),
-            self.get_id(Countries, name=x['country']),
-            self.get_id(PositionMap, remote_id=x['remote_position_id'], supplier_id=self.supplier_id)
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['birth_date', 'order', 'country_id', 'position_id']
+        name_orders = data_frame['name_order'].fillna('Western').replace('', 'Western')
+        ids_frame = pd.DataFrame({'order': self.decode_enum(NameOrderType, name_orders)})
+        ids_frame['position_id'] = self.resolve_remote_ids(PositionMap, data_frame['remote_position_id'])
+        ids_frame['country_id'] = self.resolve_column(Countries, data_frame['country'], 'name')
+        ids_frame['birth_date'] = self.parse_dates(data_frame['dob'])
         joined_frame = data_frame.join(ids_frame).drop(
             ['dob', 'name_order', 'country', 'remote_position_id'], axis=1)
         return joined_frame
 
     def managers(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            self.make_date_object(x['dob']),
-            NameOrderType.from_string(x['name_order'] or 'Western'),
-            self.get_id(Countries, name=x['country'])
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['birth_date', 'order', 'country_id']
+        name_orders = data_frame['name_order'].fillna('Western').replace('', 'Western')
+        ids_frame = pd.DataFrame({'order': self.decode_enum(NameOrderType, name_orders)})
+        ids_frame['country_id'] = self.resolve_column(Countries, data_frame['country'], 'name')
+        ids_frame['birth_date'] = self.parse_dates(data_frame['dob'])
         joined_frame = data_frame.join(ids_frame).drop(['dob', 'name_order', 'country'], axis=1)
         return joined_frame
 
     def referees(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            self.make_date_object(x['dob']),
-            NameOrderType.from_string(x['name_order'] or 'Western'),
-            self.get_id(Countries, name=x['country'])
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['birth_date', 'order', 'country_id']
+        name_orders = data_frame['name_order'].fillna('Western').replace('', 'Western')
+        ids_frame = pd.DataFrame({'order': self.decode_enum(NameOrderType, name_orders)})
+        ids_frame['country_id'] = self.resolve_column(Countries, data_frame['country'], 'name')
+        ids_frame['birth_date'] = self.parse_dates(data_frame['dob'])
         joined_frame = data_frame.join(ids_frame).drop(['dob', 'name_order', 'country'], axis=1)
         return joined_frame
 
     def league_matches(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            self.get_id(Competitions, name=x['competition']),
-            self.get_id(Seasons, name=x['season']),
-            self.get_id(Venues, name=x['venue']),
-            self.get_id(Clubs, name=x['home_team']),
-            self.get_id(Clubs, name=x['away_team']),
-            self.get_id(Managers, full_name=x['home_manager']),
-            self.get_id(Managers, full_name=x['away_manager']),
-            self.get_id(Referees, full_name=x['referee'])
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['competition_id', 'season_id', 'venue_id', 'home_team_id', 'away_team_id',
-                             'home_manager_id', 'away_manager_id', 'referee_id']
+        ids_frame = pd.DataFrame({
+            'competition_id': self.resolve_column(Competitions, data_frame['competition'], 'name'),
+            'season_id': self.resolve_seasons(data_frame['season']),
+            'venue_id': self.resolve_column(Venues, data_frame['venue'], 'name'),
+            'home_team_id': self.resolve_column(Clubs, data_frame['home_team'], 'name'),
+            'away_team_id': self.resolve_column(Clubs, data_frame['away_team'], 'name'),
+            'home_manager_id': self.resolve_names(Managers, data_frame['home_manager']),
+            'away_manager_id': self.resolve_names(Managers, data_frame['away_manager']),
+            'referee_id': self.resolve_names(Referees, data_frame['referee'])
+        })
         return data_frame.join(ids_frame)
 
     def match_lineups(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            self.get_id(ClubLeagueMatches,
-                        competition_id=self.get_id(Competitions, name=x['competition']),
-                        season_id=self.get_id(Seasons, name=x['season']),
-                        matchday=x['matchday'],
-                        home_team_id=self.get_id(Clubs, name=x['home_team']),
-                        away_team_id=self.get_id(Clubs, name=x['away_team'])),
-            self.get_id(Clubs, name=x['player_team']),
-            self.get_id(Players, full_name=x['player_name'])
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['match_id', 'team_id', 'player_id']
+        keys_frame = pd.DataFrame({
+            'competition_id': self.resolve_column(Competitions, data_frame['competition'], 'name'),
+            'season_id': self.resolve_seasons(data_frame['season']),
+            'matchday': data_frame['matchday'],
+            'home_team_id': self.resolve_column(Clubs, data_frame['home_team'], 'name'),
+            'away_team_id': self.resolve_column(Clubs, data_frame['away_team'], 'name')
+        })
+        match_index = MatchIndex(self.session, ClubLeagueMatches, list(keys_frame.columns))
+        ids_frame = pd.DataFrame({'match_id': match_index.resolve(keys_frame)})
+        for idx, keys in keys_frame[ids_frame['match_id'].isnull()].iterrows():
+            key = tuple(null_to_none(keys[field]) for field in match_index.fields)
+            self.report.add(ClubLeagueMatches, dict(zip(match_index.fields, key)), [idx],
+                            reason='ambiguous' if key in match_index.ambiguous else 'missing')
+        ids_frame['team_id'] = self.resolve_column(Clubs, data_frame['player_team'], 'name')
+        ids_frame['player_id'] = self.resolve_names(Players, data_frame['player_name'])
         return data_frame.join(ids_frame)
 
     def modifiers(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            ModifierType.from_string(x['modifier']),
-            ModifierCategoryType.from_string(x['modifier_category'])
-        ])
-        id_frame = data_frame.apply(lambdafunc, axis=1)
-        id_frame.columns = ['type', 'category']
-        joined_frame = data_frame.join(id_frame).drop(["modifier", "modifier_category"], axis=1)
-        return joined_frame
+        return data_frame.assign(
+            type=self.decode_enum(ModifierType, data_frame['modifier']),
+            category=self.decode_enum(ModifierCategoryType, data_frame['modifier_category'])
+        ).drop(["modifier", "modifier_category"], axis=1)
 
 
 class MarcottiEventTransform(MarcottiTransform):
 
+    def match_ids(self, data_frame):
+        """
+        Convert the remote IDs of the competitions, venues, clubs, managers and referees of
+        matches into local IDs.
+
+        :param data_frame: DataFrame of extracted match data.
+        :return: DataFrame of local IDs, indexed as the match data.
+        """
+        return pd.DataFrame({
+            'competition_id': self.resolve_remote_ids(CompetitionMap, data_frame['remote_competition_id']),
+            'venue_id': self.resolve_remote_ids(VenueMap, data_frame['remote_venue_id']),
+            'home_team_id': self.resolve_remote_ids(ClubMap, data_frame['remote_home_team_id']),
+            'away_team_id': self.resolve_remote_ids(ClubMap, data_frame['remote_away_team_id']),
+            'home_manager_id': self.resolve_remote_ids(ManagerMap, data_frame['remote_home_manager_id']),
+            'away_manager_id': self.resolve_remote_ids(ManagerMap, data_frame['remote_away_manager_id']),
+            'referee_id': self.resolve_remote_ids(RefereeMap, data_frame['remote_referee_id'])
+        }, columns=['competition_id', 'venue_id', 'home_team_id', 'away_team_id',
+                    'home_manager_id', 'away_manager_id', 'referee_id'])
+
     def league_matches(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            self.get_id(CompetitionMap, remote_id=x['remote_competition_id'], supplier_id=self.supplier_id),
-            self.get_id(Seasons, name=x['season_name']),
-            self.get_id(VenueMap, remote_id=x['remote_venue_id'], supplier_id=self.supplier_id),
-            self.get_id(ClubMap, remote_id=x['remote_home_team_id'], supplier_id=self.supplier_id),
-            self.get_id(ClubMap, remote_id=x['remote_away_team_id'], supplier_id=self.supplier_id),
-            self.get_id(ManagerMap, remote_id=x['remote_home_manager_id'], supplier_id=self.supplier_id),
-            self.get_id(ManagerMap, remote_id=x['remote_away_manager_id'], supplier_id=self.supplier_id),
-            self.get_id(RefereeMap, remote_id=x['remote_referee_id'], supplier_id=self.supplier_id),
-            self.make_date_object(x['date'])
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['competition_id', 'season_id', 'venue_id', 'home_team_id', 'away_team_id',
-                             'home_manager_id', 'away_manager_id', 'referee_id', 'match_date']
+        ids_frame = self.match_ids(data_frame)
+        ids_frame['season_id'] = self.resolve_seasons(data_frame['season_name'])
+        ids_frame['match_date'] = self.parse_dates(data_frame['date'])
+        if 'kickoff_time' in data_frame.columns:
+            data_frame = data_frame.assign(kickoff_time=self.parse_times(data_frame['kickoff_time']))
         joined_frame = data_frame.join(ids_frame).drop(['season_name', 'date'], axis=1)
         return joined_frame
 
     def knockout_matches(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            self.get_id(CompetitionMap, remote_id=x['remote_competition_id'], supplier_id=self.supplier_id),
-            self.get_id(Seasons, name=x['season_name']),
-            self.get_id(VenueMap, remote_id=x['remote_venue_id'], supplier_id=self.supplier_id),
-            self.get_id(ClubMap, remote_id=x['remote_home_team_id'], supplier_id=self.supplier_id),
-            self.get_id(ClubMap, remote_id=x['remote_away_team_id'], supplier_id=self.supplier_id),
-            self.get_id(ManagerMap, remote_id=x['remote_home_manager_id'], supplier_id=self.supplier_id),
-            self.get_id(ManagerMap, remote_id=x['remote_away_manager_id'], supplier_id=self.supplier_id),
-            self.get_id(RefereeMap, remote_id=x['remote_referee_id'], supplier_id=self.supplier_id),
-            KnockoutRoundType.from_string(x['round']),
-            self.make_date_object(x['date'])
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['competition_id', 'season_id', 'venue_id', 'home_team_id', 'away_team_id',
-                             'home_manager_id', 'away_manager_id', 'referee_id', 'ko_round', 'match_date']
+        ids_frame = self.match_ids(data_frame)
+        ids_frame['season_id'] = self.resolve_seasons(data_frame['season_name'])
+        ids_frame['match_date'] = self.parse_dates(data_frame['date'])
+        ids_frame['ko_round'] = self.decode_enum(KnockoutRoundType, data_frame['round'])
+        if 'kickoff_time' in data_frame.columns:
+            data_frame = data_frame.assign(kickoff_time=self.parse_times(data_frame['kickoff_time']))
         joined_frame = data_frame.join(ids_frame).drop(['season_name', 'date', 'round'], axis=1)
         return joined_frame
 
     def group_matches(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            self.get_id(CompetitionMap, remote_id=x['remote_competition_id'], supplier_id=self.supplier_id),
-            self.get_id(Seasons, name=x['season_name']),
-            self.get_id(VenueMap, remote_id=x['remote_venue_id'], supplier_id=self.supplier_id),
-            self.get_id(ClubMap, remote_id=x['remote_home_team_id'], supplier_id=self.supplier_id),
-            self.get_id(ClubMap, remote_id=x['remote_away_team_id'], supplier_id=self.supplier_id),
-            self.get_id(ManagerMap, remote_id=x['remote_home_manager_id'], supplier_id=self.supplier_id),
-            self.get_id(ManagerMap, remote_id=x['remote_away_manager_id'], supplier_id=self.supplier_id),
-            self.get_id(RefereeMap, remote_id=x['remote_referee_id'], supplier_id=self.supplier_id),
-            GroupRoundType.from_string(x['round']),
-            self.make_date_object(x['date'])
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['competition_id', 'season_id', 'venue_id', 'home_team_id', 'away_team_id',
-                             'home_manager_id', 'away_manager_id', 'referee_id', 'group_round', 'match_date']
+        ids_frame = self.match_ids(data_frame)
+        ids_frame['season_id'] = self.resolve_seasons(data_frame['season_name'])
+        ids_frame['match_date'] = self.parse_dates(data_frame['date'])
+        ids_frame['group_round'] = self.decode_enum(GroupRoundType, data_frame['round'])
+        if 'kickoff_time' in data_frame.columns:
+            data_frame = data_frame.assign(kickoff_time=self.parse_times(data_frame['kickoff_time']))
         joined_frame = data_frame.join(ids_frame).drop(['season_name', 'date', 'round'], axis=1)
         return joined_frame
 
     def match_lineups(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            self.get_id(MatchMap, remote_id=x['remote_match_id'], supplier_id=self.supplier_id),
-            self.get_id(PlayerMap, remote_id=x['remote_player_id'], supplier_id=self.supplier_id),
-            self.get_id(ClubMap, remote_id=x['remote_team_id'], supplier_id=self.supplier_id),
-            self.get_id(PositionMap, remote_id=x['remote_position_id'], supplier_id=self.supplier_id)
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['match_id', 'player_id', 'team_id', 'position_id']
+        ids_frame = pd.DataFrame({
+            'match_id': self.resolve_remote_ids(MatchMap, data_frame['remote_match_id']),
+            'player_id': self.resolve_remote_ids(PlayerMap, data_frame['remote_player_id']),
+            'team_id': self.resolve_remote_ids(ClubMap, data_frame['remote_team_id']),
+            'position_id': self.resolve_remote_ids(PositionMap, data_frame['remote_position_id'])
+        }, columns=['match_id', 'player_id', 'team_id', 'position_id'])
         return data_frame.join(ids_frame).drop(['remote_match_id', 'remote_player_id',
                                                 'remote_team_id', 'remote_position_id'], axis=1)
 
     def events(self, data_frame):
-        lambdafunc = lambda x: pd.Series([
-            self.get_id(MatchMap, remote_id=x['remote_match_id'], supplier_id=self.supplier_id),
-            self.get_id(ClubMap, remote_id=x['remote_team_id'], supplier_id=self.supplier_id)
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['match_id', 'team_id']
+        ids_frame = pd.DataFrame({
+            'match_id': self.resolve_remote_ids(MatchMap, data_frame['remote_match_id']),
+            'team_id': self.resolve_remote_ids(ClubMap, data_frame['remote_team_id'])
+        }, columns=['match_id', 'team_id'])
+        if 'timestamp' in data_frame.columns:
+            data_frame = data_frame.assign(timestamp=self.parse_timestamps(data_frame['timestamp']))
         joined_frame = data_frame.join(ids_frame).drop(['remote_match_id', 'remote_team_id'], axis=1)
         new_frame = joined_frame.where((pd.notnull(joined_frame)), None)
         return new_frame
 
     def actions(self, data_frame):
-        match_event_dict = {rec.remote_id: rec.id for rec in
-                            self.session.query(MatchEventMap).filter_by(supplier_id=self.supplier_id)}
-        match_map_dict = {rec.remote_id: rec.id for rec in
-                          self.session.query(MatchMap).filter_by(supplier_id=self.supplier_id)}
-        player_map_dict = {rec.remote_id: rec.id for rec in
-                           self.session.query(PlayerMap).filter_by(supplier_id=self.supplier_id)}
-        lambdafunc = lambda x: pd.Series([
-            match_event_dict.get(x['remote_event_id'], None),
-            match_map_dict.get(x['remote_match_id'], None),
-            player_map_dict.get(x['remote_player_id'], None),
-            ActionType.from_string(x['action_type']),
-        ])
-        ids_frame = data_frame.apply(lambdafunc, axis=1)
-        ids_frame.columns = ['event_id', 'match_id', 'player_id', 'type']
+        ids_frame = pd.DataFrame({
+            'event_id': self.resolve_remote_ids(MatchEventMap, data_frame['remote_event_id']),
+            'match_id': self.resolve_remote_ids(MatchMap, data_frame['remote_match_id']),
+            'player_id': self.resolve_remote_ids(PlayerMap, data_frame['remote_player_id'])
+        }, columns=['event_id', 'match_id', 'player_id'])
+        ids_frame['type'] = self.decode_enum(ActionType, data_frame['action_type'])
         joined_frame = data_frame.join(ids_frame).drop(['remote_event_id', 'remote_match_id',
                                                         'remote_player_id', 'action_type'], axis=1)
         new_frame = joined_frame.where((pd.notnull(joined_frame)), None)
@@ -0,0 +1,70 @@
+from itertools import izip
+
+
+CHUNK_SIZE = 500
+
+
+def chunks(sequence, size=CHUNK_SIZE):
+    """
+    Split a sequence into consecutive chunks of at most `size` elements.
+
+    :param sequence: Sequence (list, tuple) of elements.
+    :param size: Maximum number of elements in a chunk.
+    :return: Generator of sequence slices.
+    """
+    for start in range(0, len(sequence), size):
+        yield sequence[start:start+size]
+
+
+def null_to_none(value):
+    """
+    Convert floating-point NaN values, which Pandas uses to mark missing data, to None.
+
+    :param value: Data value.
+    :return: Data value, or None if value is NaN.
+    """
+    return None if isinstance(value, float) and value != value else value
+
+
+def records(data_frame, fields=None):
+    """
+    Iterate over the rows of a data frame as dictionaries of selected fields.
+
+    Every column is converted once to a list of Python values, and rows are assembled from the
+    column lists, so no Series is created per row and column types are kept.  Fields that are
+    not columns of the data frame are left out of the dictionaries.
+
+    :param data_frame: Pandas DataFrame.
+    :param fields: List of fields, or None for all columns.
+    :return: Generator of dictionaries keyed by field name.
+    """
+    fields = _columns(data_frame, fields)
+    for values in _rows(data_frame, fields):
+        yield dict(izip(fields, values))
+
+
+def record_items(data_frame, fields):
+    """
+    Iterate over the rows of a data frame as tuples of (field, value) pairs of selected fields,
+    in field order and without missing (None) values.  The tuples can be collected in sets to
+    remove duplicate rows.
+
+    :param data_frame: Pandas DataFrame.
+    :param fields: List of fields.
+    :return: Generator of tuples of (field, value) pairs.
+    """
+    fields = _columns(data_frame, fields)
+    for values in _rows(data_frame, fields):
+        yield tuple((field, value) for field, value in izip(fields, values) if value is not None)
+
+
+def _columns(data_frame, fields):
+    if fields is None:
+        return list(data_frame.columns)
+    return [field for field in fields if field in data_frame.columns]
+
+
+def _rows(data_frame, fields):
+    if not fields:
+        return [()] * len(data_frame)
+    return izip(*[data_frame[field].tolist() for field in fields])
@@ -1,9 +1,19 @@
-from datetime import date
+import logging
+from datetime import date, time
+from multiprocessing import Pool
 
 import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
 from marcottievents.models.common.suppliers import Suppliers
+from .cache import RemoteIdResolver, ReferenceCache, NameIndex
+from .report import LookupReport
+from .utils import chunks, null_to_none
+
+
+logger = logging.getLogger(__name__)
 
 
 class ETL(object):
@@ -11,12 +21,39 @@ class ETL(object):
     Top-level ETL workflow.
 
     Receive extracted data from XML and/or CSV sources, transform/validate it, and load it to database.
+
+    If more than one worker is set, match events and actions are partitioned by match and the
+    partitions are loaded in parallel by a pool of worker processes.  Unless a cache size is set,
+    the remote ID resolvers of the workers hold at most `WORKER_CACHE_SIZE` remote IDs per mapper
+    model, so that every partition retrieves only the mappings of its own remote IDs.
+
+    Workflows that load only part of the data of an entity (chunks of a stream, partitions of a
+    worker process) are marked `partial`, and leave the load checkpoints of the entity in place.
     """
+    PARALLEL_ENTITIES = ('events', 'actions')
+    PARTITION_KEY = 'remote_match_id'
+    WORKER_CACHE_SIZE = 10000
 
     def __init__(self, **kwargs):
+        self.options = {key: value for key, value in kwargs.items()
+                        if key not in ('session', 'workers', 'ledger', 'dead_letter')}
+        self.session = kwargs.get('session')
+        self.workers = kwargs.get('workers')
+        self.ledger = kwargs.get('ledger')
+        self.dead_letter = kwargs.get('dead_letter')
+        self.match_errors = []
+        self.reports = {}
+        self.log_reports = True
+        self.partial = False
         self.supplier = kwargs.get('supplier')
-        self.transformer = kwargs.get('transform')(kwargs.get('session'), self.supplier)
-        self.loader = kwargs.get('load')(kwargs.get('session'), self.supplier)
+        self.resolver = RemoteIdResolver(kwargs.get('session'), maxsize=kwargs.get('cache_size'))
+        self.references = ReferenceCache(kwargs.get('session'), resolver=self.resolver)
+        self.transformer = kwargs.get('transform')(kwargs.get('session'), self.supplier,
+                                                   references=self.references)
+        self.loader = kwargs.get('load')(kwargs.get('session'), self.supplier, references=self.references,
+                                         backend=kwargs.get('backend', 'orm'),
+                                         batch_size=kwargs.get('batch_size'),
+                                         checkpoint=kwargs.get('checkpoint', False))
 
     def workflow(self, entity, *data):
         """
@@ -26,10 +63,174 @@ class ETL(object):
         2. Transform and validate combined data into IDs and enums in the Marcotti database.
         3. Load transformed data into the database if it is not already there.
 
+        Nothing is loaded if there is no extracted data, e.g. if all data files are unchanged.
+
+        The transformer and loader share a cache of reference data (remote ID mappings, season
+        names, validation tables) that is kept across workflows.  If the workflow fails, the cache
+        is discarded because it may include records that were not committed to the database.
+
+        If an ingestion ledger is set, the data files extracted for the entity are committed to
+        the ledger when all data is loaded, and discarded from the ledger when the workflow fails
+        or some matches or batches are not loaded.  Likewise, the load checkpoints of the entity are
+        cleared when all data is loaded, and kept otherwise so that the load can be resumed.
+
+        Values that do not resolve to a unique database record in the transform or load stage are
+        collected in a lookup report of the entity, which is logged once at the end of the
+        workflow and kept in `reports`.  If a dead-letter directory is set, the data rows that are
+        affected are also appended to a CSV file of the entity in that directory.
+
         :param entity: Data model name
         :param data: Data payloads from XML and/or CSV sources, in lists of dictionaries
+        :return: :class:`LookupReport` of the entity.
+        """
+        failures = self.failures()
+        report = self.transformer.report = self.loader.report = LookupReport(entity)
+        try:
+            data_frame = self.combiner(*data)
+            if data_frame.empty:
+                logger.info("No {} data to load".format(entity))
+            elif entity in self.PARALLEL_ENTITIES and self.workers and self.workers > 1:
+                self.parallel_workflow(entity, data_frame)
+            else:
+                getattr(self.loader, entity)(getattr(self.transformer, entity)(data_frame))
+        except Exception:
+            self.references.invalidate()
+            if self.ledger is not None:
+                self.ledger.discard(entity)
+            raise
+        if self.ledger is not None:
+            if self.failures() == failures:
+                self.ledger.commit(entity)
+            else:
+                self.ledger.discard(entity)
+        if not self.partial and self.failures() == failures:
+            self.clear_checkpoints(entity)
+        if self.log_reports:
+            report.log()
+        if self.dead_letter is not None:
+            report.dead_letter(data_frame, self.dead_letter)
+        self.reports[entity] = report
+        return report
+
+    def workflow_stream(self, entity, chunks):
         """
-        getattr(self.loader, entity)(getattr(self.transformer, entity)(self.combiner(*data)))
+        Implement ETL workflow for a specific data entity, one chunk of extracted data at a time.
+
+        Every chunk is transformed and loaded in turn, so that only one chunk of data is held in
+        memory.  Data rows are indexed by their position in the whole stream.  Match events and
+        actions are expected in match order; the rows of the last match of a chunk are held back
+        and loaded with the next chunk, so that the data of a match is always loaded together.
+
+        The reference data cache, ingestion ledger, lookup report and dead-letter file are handled
+        as in :meth:`workflow`, with a single lookup report for the whole stream.  Data files are
+        committed to the ledger, and load checkpoints are cleared, only when all chunks are loaded.
+
+        :param entity: Data model name
+        :param chunks: Iterator of chunks of extracted data, in lists of dictionaries or DataFrames.
+        :return: :class:`LookupReport` of the entity.
+        """
+        failures = self.failures()
+        report = LookupReport(entity)
+        log_reports, self.log_reports = self.log_reports, False
+        ledger, self.ledger = self.ledger, None
+        partial, self.partial = self.partial, True
+        offset = 0
+        held = None
+        try:
+            for chunk in chunks:
+                data_frame = pd.DataFrame(chunk)
+                data_frame.index = pd.RangeIndex(offset, offset + len(data_frame))
+                offset += len(data_frame)
+                if held is not None:
+                    data_frame = pd.concat([held, data_frame])
+                    held = None
+                if data_frame.empty:
+                    continue
+                if entity in self.PARALLEL_ENTITIES and self.PARTITION_KEY in data_frame.columns:
+                    last = data_frame[self.PARTITION_KEY] == data_frame[self.PARTITION_KEY].iloc[-1]
+                    data_frame, held = data_frame[~last], data_frame[last]
+                    if data_frame.empty:
+                        continue
+                report.extend(self.workflow(entity, data_frame))
+            if held is not None and not held.empty:
+                report.extend(self.workflow(entity, held))
+        except Exception:
+            if ledger is not None:
+                ledger.discard(entity)
+            raise
+        finally:
+            self.log_reports = log_reports
+            self.ledger = ledger
+            self.partial = partial
+        if ledger is not None:
+            if self.failures() == failures:
+                ledger.commit(entity)
+            else:
+                ledger.discard(entity)
+        if not self.partial and self.failures() == failures:
+            self.clear_checkpoints(entity)
+        if log_reports:
+            report.log()
+        self.reports[entity] = report
+        return report
+
+    def clear_checkpoints(self, entity):
+        """
+        Clear the load checkpoints of a data entity, if the loader keeps a checkpoint journal.
+
+        :param entity: Data model name
+        """
+        if hasattr(self.loader, 'clear_checkpoints'):
+            self.loader.clear_checkpoints(entity)
+
+    def failures(self):
+        """
+        Count the matches and batches of data that have failed to load.
+
+        :return: Number of failed matches and batches.
+        """
+        return len(self.match_errors) + len(getattr(self.loader, 'failed_batches', []))
+
+    def parallel_workflow(self, entity, data_frame):
+        """
+        Implement ETL workflow for match events or actions, with one partition of data per match.
+
+        Every worker process creates its own database engine, session and ETL workflow once, and
+        every partition is transformed and loaded by one of the workers and committed separately.
+        Matches whose partitions fail are logged and recorded in `match_errors` as (remote match
+        ID, error message) tuples, in remote match ID order.  The lookup reports of the partitions
+        are added to the lookup report of the transformer.  Rows without a remote match ID do not
+        belong to a partition and are transformed and loaded in this process, as in the serial
+        workflow.
+
+        :param entity: Data model name
+        :param data_frame: DataFrame of combined data.
+        """
+        url = self.session.get_bind().engine.url
+        self.session.commit()
+        unmatched = data_frame[data_frame[self.PARTITION_KEY].isnull()]
+        partitions = list(data_frame.groupby(self.PARTITION_KEY, sort=True))
+        tasks = [(entity, remote_match_id, partition.to_dict('records'))
+                 for remote_match_id, partition in partitions]
+        options = dict(self.options)
+        if options.get('cache_size') is None:
+            options['cache_size'] = self.WORKER_CACHE_SIZE
+        pool = Pool(self.workers, initializer=_init_worker, initargs=(url, options))
+        try:
+            results = pool.map(_match_workflow, tasks, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        self.resolver.invalidate()
+        for (_, partition), (_, _, report) in zip(partitions, results):
+            if report is not None:
+                self.transformer.report.extend(report, index=partition.index)
+        errors = [(remote_match_id, error) for remote_match_id, error, _ in results if error is not None]
+        for remote_match_id, error in errors:
+            logger.error("Failed to load {} of match {}: {}".format(entity, remote_match_id, error))
+        self.match_errors.extend(errors)
+        if not unmatched.empty:
+            getattr(self.loader, entity)(getattr(self.transformer, entity)(unmatched))
 
     @staticmethod
     def combiner(*data_dicts):
@@ -48,23 +249,238 @@ class ETL(object):
         return data_frames[0]
 
 
+_worker = {}
+
+
+def _init_worker(url, options):
+    """
+    Create the database engine, session and ETL workflow of a worker process.
+
+    :param url: Database URL object, which keeps the password that its string form hides.
+    :param options: ETL options.
+    """
+    engine = create_engine(url)
+    session = Session(engine)
+    etl = ETL(session=session, **options)
+    etl.log_reports = False
+    etl.partial = True
+    session.commit()
+    _worker.update(engine=engine, session=session, etl=etl)
+
+
+def _match_workflow(task):
+    """
+    Load one partition of match data in a worker process.
+
+    :param task: Tuple of data model name, remote match ID, and list of data records of the match.
+    :return: Tuple of remote match ID, error message or None if the partition was loaded, and
+             lookup report of the partition or None if it was not transformed.
+    """
+    entity, remote_match_id, records = task
+    session, etl = _worker['session'], _worker['etl']
+    etl.loader.failed_batches = []
+    try:
+        report = etl.workflow(entity, records)
+        session.commit()
+    except Exception as ex:
+        session.rollback()
+        return remote_match_id, "{}: {}".format(type(ex).__name__, ex), None
+    if etl.loader.failed_batches:
+        return remote_match_id, "; ".join("rows {}-{}: {}".format(first, last, error)
+                                          for _, first, last, error in etl.loader.failed_batches), report
+    return remote_match_id, None, report
+
+
 class WorkflowBase(object):
 
-    def __init__(self, session, supplier):
+    def __init__(self, session, supplier, resolver=None, references=None):
         self.session = session
+        self.report = LookupReport()
         self.supplier_id = self.get_id(Suppliers, name=supplier) if supplier else None
+        self.references = references or ReferenceCache(session, resolver=resolver)
+        self.resolver = self.references.resolver
+        self.season_names = self.references.season_names
+        self.name_indexes = {}
 
     def get_id(self, model, **conditions):
         try:
             record_id = self.session.query(model).filter_by(**conditions).one().id
         except NoResultFound as ex:
-            print "{} has no records in Marcotti database for: {}".format(model.__name__, conditions)
+            self.report.add(model, conditions)
             return None
         except MultipleResultsFound as ex:
-            print "{} has multiple records in Marcotti database for: {}".format(model.__name__, conditions)
+            self.report.add(model, conditions, reason='ambiguous')
             return None
         return record_id
 
+    def resolve_column(self, model, column, key):
+        """
+        Convert column of natural key values into local IDs of a data model.
+
+        The unique values of the column are retrieved with one query per chunk of values, or from
+        the reference data cache for validation tables.  Values that match no record or more than
+        one record are added to the lookup report and resolve to None.
+
+        :param model: Data model class.
+        :param column: Series of natural key values.
+        :param key: Model field (column or hybrid property) that the values refer to.
+        :return: Series of local IDs.
+        """
+        field = getattr(model, key)
+        values = list(column.dropna().unique())
+        ids = {}
+        ambiguous = set()
+        if model in self.references.MODELS:
+            ids = self.references.lookup(model, key, values)
+        else:
+            for chunk in chunks(values):
+                for value, record_id in self.session.query(field, model.id).filter(field.in_(chunk)):
+                    if value in ids and ids[value] != record_id:
+                        ambiguous.add(value)
+                    ids[value] = record_id
+        for value in ambiguous:
+            del ids[value]
+        resolved = pd.Series([ids.get(null_to_none(value)) for value in column], index=column.index, dtype=object)
+        self.report.add_column(model, key, column, resolved, ambiguous)
+        return resolved
+
+    def resolve_names(self, model, column):
+        """
+        Convert column of full names into local IDs of a person data model.
+
+        Names are resolved through an in-process name index of the model that is kept across data
+        frames.  Unknown and ambiguous names are added to the lookup report and resolve to None.
+
+        :param model: Person data model class (Players, Managers, Referees).
+        :param column: Series of full names.
+        :return: Series of local IDs.
+        """
+        if model not in self.name_indexes:
+            self.name_indexes[model] = NameIndex(self.session, model)
+        index = self.name_indexes[model]
+        ids = index.map(column)
+        self.report.add_column(model, 'full_name', column, ids, index.ambiguous)
+        return ids
+
+    def resolve_seasons(self, column):
+        """
+        Convert column of season names into season IDs through the season name cache.
+
+        :param column: Series of season names.
+        :return: Series of season IDs.
+        """
+        ids = self.season_names.map(column)
+        self.report.add_column('Seasons', 'name', column, ids)
+        return ids
+
+    def resolve_remote_ids(self, model, column):
+        """
+        Convert column of a supplier's remote IDs into local IDs through the remote ID resolver.
+
+        The unique remote IDs of the column are resolved together, so a bounded resolver cache
+        retrieves the IDs that it does not hold with one query per chunk of remote IDs.  Remote IDs
+        that are not mapped are added to the lookup report.
+
+        :param model: Mapper model class.
+        :param column: Series of remote IDs.
+        :return: Series of local IDs, with None for unmapped remote IDs.
+        """
+        ids = self.resolver.map(model, column, self.supplier_id)
+        self.report.add_column(model, 'remote_id', column, ids)
+        return ids
+
+    def get_map_id(self, model, remote_id):
+        """
+        Retrieve local ID of a supplier's remote ID from the remote ID resolver.  Remote IDs that
+        are not mapped are added to the lookup report.
+
+        :param model: Mapper model class.
+        :param remote_id: Remote ID of the supplier.
+        :return: Local ID, or None if the remote ID is not mapped.
+        """
+        local_id = self.resolver.get(model, remote_id, self.supplier_id)
+        if local_id is None and null_to_none(remote_id) is not None:
+            self.report.add(model, dict(remote_id=remote_id))
+        return local_id
+
+    @staticmethod
+    def decode_enum(enum, values):
+        """
+        Convert column of strings into enumerated type symbols.
+
+        :param enum: Enumerated type class (subclass of :class:`DeclEnum`).
+        :param values: Series of enumerated type values.
+        :return: Series of enumerated type symbols.
+        :raises ValueError: If any of the values is not in the enumerated type.  All unknown
+                            values are listed in the error message.
+        """
+        symbols = values.map(enum._reg)
+        unknown = values[symbols.isnull()]
+        if len(unknown):
+            raise ValueError("Invalid values for %r: %r" % (enum.__name__, sorted(set(unknown))))
+        return symbols
+
+    @staticmethod
+    def parse_dates(values, fmt='%Y-%m-%d'):
+        """
+        Convert column of date strings into date objects.
+
+        :param values: Series of date strings.
+        :param fmt: Date format, ISO 8601 by default.
+        :return: Series of :class:`datetime.date` objects, with None for missing or invalid dates.
+        """
+        parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+        return parsed.dt.date.astype(object).where(parsed.notnull(), None)
+
+    @staticmethod
+    def parse_times(values, formats=('%H:%M', '%H:%M:%S')):
+        """
+        Convert column of time strings into time objects.
+
+        Every time format is tried in turn on the values that have not been converted yet, and the
+        remaining values are parsed without a format.  Values that are already time objects are
+        kept, and empty strings are missing.  Time strings that still do not parse are counted in
+        a warning.
+
+        :param values: Series of time strings.
+        :param formats: Sequence of time formats, hours and minutes with optional seconds by default.
+        :return: Series of :class:`datetime.time` objects, with None for missing or invalid times.
+        """
+        values = values.map(lambda value: value.strip() if isinstance(value, basestring) else value)
+        times = values.map(lambda value: value if isinstance(value, time) else None)
+        strings = values.map(lambda value: isinstance(value, basestring) and value != "").astype(bool)
+        for fmt in list(formats) + [None]:
+            pending = strings & times.isnull()
+            if not pending.any():
+                break
+            parsed = pd.to_datetime(values[pending], format=fmt, errors='coerce')
+            times[parsed[parsed.notnull()].index] = parsed[parsed.notnull()].dt.time
+        invalid = strings & times.isnull()
+        if invalid.any():
+            logger.warning("{} times do not match any time format".format(invalid.sum()))
+        return times.astype(object).where(times.notnull(), None)
+
+    @staticmethod
+    def parse_timestamps(values, fmt=None):
+        """
+        Convert column of event timestamps into the timestamp strings of match events.
+
+        Timestamp strings are stored as they appear in the data feed, including the strings that
+        do not parse with the timestamp format, which are counted in a warning.  Timestamps that
+        were extracted as datetime values are converted to ISO 8601 strings.
+
+        :param values: Series of timestamp strings or datetime values.
+        :param fmt: Timestamp format, or None to parse ISO 8601 timestamps with optional fractional seconds.
+        :return: Series of timestamp strings, with None for missing timestamps.
+        """
+        strings = values.map(lambda value: isinstance(value, basestring)).astype(bool)
+        parsed = pd.to_datetime(values.where(~strings), errors='coerce')
+        invalid = pd.to_datetime(values.where(strings), format=fmt, errors='coerce').isnull() & strings
+        if invalid.any():
+            logger.warning("{} timestamps do not match the timestamp format".format(invalid.sum()))
+        converted = parsed.map(lambda timestamp: timestamp.isoformat()).astype(object)
+        return values.where(strings, converted).where(strings | parsed.notnull(), None)
+
     @staticmethod
     def make_date_object(iso_date):
         """
@@ -1,7 +1,15 @@
 import os
 import csv
-import glob
 import logging
+from functools import wraps
+from itertools import chain, islice
+from multiprocessing import Pool
+
+import pandas as pd
+
+from marcottievents.etl.base.compression import feed_files, open_feed
+from .schema import SCHEMAS, compile_schema
+from .frame import read_frame, empty_frame
 
 
 logger = logging.getLogger(__name__)
@@ -11,21 +19,199 @@ def extract(func):
     """
     Decorator function. Open and extract data from CSV files.  Return list of dictionaries.
 
+    If the extractor has an ingestion ledger, files that have not changed since they were last
+    ingested for the data entity (the name of the wrapped function) are skipped.
+
+    The wrapped function receives a reader of every file (see :meth:`BaseCSV.reader`): a
+    `csv.reader` of rows for data entities with a declared schema, and a `csv.DictReader` of rows
+    keyed by column header for other data entities, so that their rows can be read with the
+    `column*` helpers.  With the 'pandas' engine, files of data entities with a declared schema
+    are read by `pandas.read_csv` instead of the wrapped function, and a DataFrame is returned.
+
+    Files are extracted in path order, by a pool of worker processes if the extractor has more
+    than one worker.  If a chunk size is passed, files are instead streamed one after another and
+    a generator of chunks of at most that many rows is returned.
+
     :param func: Wrapped function with *args and **kwargs arguments.
     """
-    def _wrapper(*args):
-        out = []
-        instance, prefix = args
-        for fname in glob.glob(os.path.join(getattr(instance, 'directory'), *prefix)):
-            with open(fname) as g:
-                out.extend(func(instance, data=csv.DictReader(g)))
-        return out
+    @wraps(func)
+    def _wrapper(instance, prefix, chunk_size=None):
+        fnames = instance.files(prefix, func.__name__)
+        if chunk_size:
+            return instance.stream_files(func.__name__, fnames, chunk_size)
+        return instance.extract_files(func.__name__, fnames)
+    _wrapper.func = func
     return _wrapper
 
 
+def _read_file(task):
+    """
+    Extract data from one CSV file in a worker process.
+
+    :param task: Tuple of extractor, data entity name, and path of data file.
+    :return: Extracted data of the file.
+    """
+    instance, entity, fname = task
+    return instance.read_file(entity, fname)
+
+
 class BaseCSV(object):
-    def __init__(self, directory):
+    """
+    Base class for data extraction from CSV data files.
+
+    Data entities are extracted following the schemas in `SCHEMAS`, which map CSV columns to
+    data fields and value types.  The default 'python' engine reads files row by row with
+    `csv.reader` and a converter compiled from the schema and the header of each file.  The
+    'pandas' engine reads every file with `pandas.read_csv` and converts it by columns.
+
+    If more than one worker is set, the files of a data entity are extracted in parallel by a
+    pool of worker processes.  The extracted data of all files is returned in path order, as a
+    list of dictionaries, or as one DataFrame with the 'pandas' engine or if `as_frame` is set.
+
+    Data files compressed with gzip, bzip2 or xz, and members of zip archives, are decompressed
+    while they are read.  Members of zip archives are extracted if the file prefix names the
+    archive, e.g. ('2016.zip', 'lineups_*.csv').
+
+    Extraction methods called with a chunk size stream the data of all files in chunks of at most
+    that many rows instead, so that only one chunk is held in memory at a time.
+    """
+    ENGINES = ('python', 'pandas')
+    SCHEMAS = SCHEMAS
+
+    def __init__(self, directory, ledger=None, engine='python', workers=None, as_frame=False):
+        if engine not in self.ENGINES:
+            raise ValueError("Invalid CSV extractor engine: {}".format(engine))
         self.directory = directory
+        self.ledger = ledger
+        self.engine = engine
+        self.workers = workers
+        self.as_frame = as_frame
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['ledger'] = None
+        return state
+
+    def files(self, prefix, entity):
+        """
+        List the data files of a data entity, skipping files that are unchanged according to the
+        ingestion ledger.  Compressed files and members of zip archives are included, see
+        :func:`feed_files`.
+
+        :param prefix: Tuple of path components, relative to the data directory, that may
+                       include glob patterns.
+        :param entity: Data entity name.
+        :return: List of file paths.
+        """
+        fnames = feed_files(os.path.join(self.directory, *prefix))
+        if self.ledger is not None:
+            fnames = [fname for fname in fnames if self.ledger.changed(fname, entity)]
+        return fnames
+
+    def read_file(self, entity, fname):
+        """
+        Extract data of a data entity from one CSV file.
+
+        :param entity: Data entity name.
+        :param fname: Path of data file.
+        :return: DataFrame with the 'pandas' engine, list of dictionaries otherwise.
+        """
+        if self.engine == 'pandas' and entity in self.SCHEMAS:
+            return read_frame(fname, self.SCHEMAS[entity])
+        with open_feed(fname) as g:
+            return list(getattr(type(self), entity).func(self, data=self.reader(entity, g)))
+
+    def extract_files(self, entity, fnames):
+        """
+        Extract data of a data entity from CSV files, in parallel if more than one worker is set.
+
+        :param entity: Data entity name.
+        :param fnames: List of paths of data files.
+        :return: Extracted data of all files in file order, as a DataFrame with the 'pandas' engine
+                 or if `as_frame` is set, and as a list of dictionaries otherwise.
+        """
+        if self.workers > 1 and len(fnames) > 1:
+            pool = Pool(self.workers)
+            try:
+                results = pool.map(_read_file, [(self, entity, fname) for fname in fnames],
+                                   chunksize=max(1, len(fnames) // (4 * self.workers)))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = [self.read_file(entity, fname) for fname in fnames]
+        if self.engine == 'pandas' and entity in self.SCHEMAS:
+            return pd.concat(results, ignore_index=True) if results else empty_frame(self.SCHEMAS[entity])
+        if self.as_frame:
+            return pd.concat([pd.DataFrame(result) for result in results], ignore_index=True) \
+                if results else pd.DataFrame()
+        return list(chain.from_iterable(results))
+
+    def stream_files(self, entity, fnames, chunk_size):
+        """
+        Extract data of a data entity from CSV files in chunks of rows.
+
+        Files are read one after another and their rows are converted as they are read, so chunks
+        may span files.  Chunks are lists of dictionaries, or DataFrames with the 'pandas' engine or
+        if `as_frame` is set.
+
+        :param entity: Data entity name.
+        :param fnames: List of paths of data files.
+        :param chunk_size: Maximum number of rows per chunk.
+        :return: Generator of chunks of extracted data, in file order.
+        """
+        if self.engine == 'pandas' and entity in self.SCHEMAS:
+            frames = chain.from_iterable(read_frame(fname, self.SCHEMAS[entity], chunksize=chunk_size)
+                                         for fname in fnames)
+            for chunk in rechunk(frames, chunk_size):
+                yield chunk
+            return
+        rows = chain.from_iterable(self.iter_file(entity, fname) for fname in fnames)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield pd.DataFrame(chunk) if self.as_frame else chunk
+
+    def iter_file(self, entity, fname):
+        """
+        Extract data of a data entity from one CSV file, row by row.
+
+        :param entity: Data entity name.
+        :param fname: Path of data file.
+        :return: Generator of dictionaries.
+        """
+        with open_feed(fname) as g:
+            for record in getattr(type(self), entity).func(self, data=self.reader(entity, g)):
+                yield record
+
+    def reader(self, entity, f):
+        """
+        Create the reader of a CSV file that is passed to the extraction method of a data entity.
+
+        :param entity: Data entity name.
+        :param f: File object of CSV data.
+        :return: `csv.reader` of rows (lists of strings) if the data entity has a schema in
+                 `SCHEMAS`, and `csv.DictReader` of rows (dictionaries keyed by column header)
+                 otherwise.
+        """
+        return csv.reader(f) if entity in self.SCHEMAS else csv.DictReader(f)
+
+    def convert(self, entity, rows):
+        """
+        Convert the rows of a CSV file into dictionaries of the fields of a data entity.
+
+        :param entity: Data entity name.
+        :param rows: Iterator of rows (lists of strings), header row first.
+        :return: Generator of dictionaries.
+        """
+        header = next(rows, None)
+        if header is None:
+            return
+        converter = compile_schema(self.SCHEMAS[entity], header)
+        for row in rows:
+            if row:
+                yield converter(row)
 
     @staticmethod
     def column(field, **kwargs):
@@ -58,3 +244,26 @@ class BaseCSV(object):
             return float(self.column(field, **kwargs))
         except (KeyError, TypeError):
             return None
+
+
+def rechunk(frames, size):
+    """
+    Regroup a sequence of DataFrames into DataFrames of `size` rows, except the last one.
+
+    :param frames: Iterator of DataFrames with the same columns.
+    :param size: Number of rows per DataFrame.
+    :return: Generator of DataFrames.
+    """
+    pending, count = [], 0
+    for frame in frames:
+        pending.append(frame)
+        count += len(frame)
+        if count < size:
+            continue
+        combined = pd.concat(pending, ignore_index=True)
+        for start in range(0, len(combined) - size + 1, size):
+            yield combined.iloc[start:start + size].reset_index(drop=True)
+        pending = [combined.iloc[len(combined) - len(combined) % size:]]
+        count = len(pending[0])
+    if count:
+        yield pd.concat(pending, ignore_index=True)
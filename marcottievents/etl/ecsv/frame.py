@@ -0,0 +1,121 @@
+import pandas as pd
+
+from marcottievents.etl.base.compression import open_feed
+from .schema import MISSING
+
+
+INTEGER = r'[+-]?\d+$'
+
+
+def read_frame(path, schema, chunksize=None):
+    """
+    Read a CSV data file into a DataFrame of extracted data fields.
+
+    The file is parsed once by the C parser of `pandas.read_csv`, with all columns read as strings,
+    and every column is then converted to its field type as a whole.  Values are stripped, and
+    empty values become missing.  Fields whose columns are not in the file take missing values
+    (None, or False for 'bool' fields) in every row, except optional fields, which are left out of
+    the DataFrame.
+
+    :param path: Path of CSV data file, which may be compressed (see :func:`open_feed`).
+    :param schema: List of :class:`Field` objects.
+    :param chunksize: Number of rows per DataFrame, or None to read the whole file.
+    :return: DataFrame with one column per field, or generator of DataFrames of at most
+             `chunksize` rows if a chunk size is set.
+    """
+    if chunksize is None:
+        with open_feed(path) as f:
+            return convert_frame(read_raw(f, schema), schema)
+    return read_chunks(path, schema, chunksize)
+
+
+def read_chunks(path, schema, chunksize):
+    """
+    Read a CSV data file into DataFrames of extracted data fields, in chunks of rows.
+
+    :param path: Path of CSV data file.
+    :param schema: List of :class:`Field` objects.
+    :param chunksize: Number of rows per DataFrame.
+    :return: Generator of DataFrames with one column per field.
+    """
+    with open_feed(path) as f:
+        for raw in read_raw(f, schema, chunksize):
+            yield convert_frame(raw, schema)
+
+
+def read_raw(f, schema, chunksize=None):
+    """
+    Parse the columns of the fields of a schema from a CSV data file, as strings.
+
+    :param f: File object of CSV data.
+    :param schema: List of :class:`Field` objects.
+    :param chunksize: Number of rows per DataFrame, or None to read the whole file.
+    :return: DataFrame of strings, or iterator of DataFrames if a chunk size is set.
+    """
+    headers = set(field.header for field in schema)
+    return pd.read_csv(f, dtype=str, na_filter=False, usecols=lambda header: header in headers,
+                       chunksize=chunksize)
+
+
+def convert_frame(raw, schema):
+    """
+    Convert a DataFrame of CSV strings into a DataFrame of extracted data fields.
+
+    :param raw: DataFrame of strings, with CSV column headers.
+    :param schema: List of :class:`Field` objects.
+    :return: DataFrame with one column per field.
+    """
+    columns = {}
+    for field in schema:
+        if field.header in raw.columns:
+            columns[field.name] = convert(raw[field.header], field.type)
+        elif not field.optional:
+            columns[field.name] = pd.Series([MISSING.get(field.type)] * len(raw), index=raw.index)
+    return pd.DataFrame(columns, index=raw.index)
+
+
+def empty_frame(schema):
+    """
+    Create a DataFrame without rows for the fields of a schema.
+
+    :param schema: List of :class:`Field` objects.
+    :return: Empty DataFrame.
+    """
+    return pd.DataFrame(columns=[field.name for field in schema if not field.optional])
+
+
+def convert(values, type):
+    """
+    Convert a column of CSV strings to a field type.
+
+    Values are converted as by the converters of the 'python' engine, and values that those
+    converters reject (e.g. 'abc' or '1.5' in an 'int' column) raise an error as well.
+
+    :param values: Series of strings.
+    :param type: Field type: 'str', 'unicode', 'int', 'float' or 'bool'.
+    :return: Series of converted values.  Missing values are None in columns of objects, NaN in
+             numeric columns, and False in boolean columns.
+    :raises ValueError: If any of the values of a numeric or boolean column is not a number of the
+                        field type.  All invalid values are listed in the error message.
+    """
+    values = values.str.strip()
+    values = values.where(values != "", None)
+    if type == 'str':
+        return values
+    if type == 'unicode':
+        decoded = values.str.decode('utf-8')
+        return decoded.where(values.notnull(), None)
+    if type not in ('int', 'float', 'bool'):
+        raise ValueError("Invalid field type: {}".format(type))
+    numbers = pd.to_numeric(values, errors='coerce')
+    if type == 'float':
+        invalid = values[numbers.isnull() & values.notnull()]
+    else:
+        invalid = values[values.notnull() & ~values.str.match(INTEGER).fillna(False).astype(bool)]
+    if len(invalid):
+        raise ValueError("Invalid values for {} field: {!r}".format(type, sorted(set(invalid))))
+    if type == 'int':
+        return numbers if numbers.isnull().any() else numbers.astype(int)
+    if type == 'float':
+        return numbers.astype(float)
+    return numbers.fillna(0) != 0
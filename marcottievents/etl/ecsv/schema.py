@@ -0,0 +1,201 @@
+from operator import itemgetter
+from itertools import izip
+from collections import namedtuple
+
+
+class Field(namedtuple('Field', ['name', 'header', 'type', 'optional'])):
+    """
+    Field of a CSV data file.
+
+    :ivar name: Name of the extracted data field.
+    :ivar header: Column header in the CSV file.
+    :ivar type: Value type: 'str' (stripped byte string), 'unicode', 'int', 'float' or 'bool'.
+    :ivar optional: True if the field is extracted only from files that have the column.
+    """
+    __slots__ = ()
+
+    def __new__(cls, name, header, type='str', optional=False):
+        return super(Field, cls).__new__(cls, name, header, type, optional)
+
+
+def _str(value):
+    value = value.strip()
+    return value if value != "" else None
+
+
+def _unicode(value):
+    value = _str(value)
+    return value.decode('utf-8') if value is not None else None
+
+
+def _int(value):
+    value = _str(value)
+    return int(value) if value is not None else None
+
+
+def _float(value):
+    value = _str(value)
+    return float(value) if value is not None else None
+
+
+def _bool(value):
+    return bool(_int(value))
+
+
+CONVERTERS = {'str': _str, 'unicode': _unicode, 'int': _int, 'float': _float, 'bool': _bool}
+
+MISSING = {'bool': False}
+
+
+def compile_schema(schema, header):
+    """
+    Compile the schema of a data entity into a converter of the rows of a CSV file.
+
+    The converter selects the values of all fields with one `operator.itemgetter` call and
+    applies a tuple of type converters, so the positions of the columns are resolved once per
+    file.  Fields whose columns are not in the file take missing values (None, or False for
+    'bool' fields), except optional fields, which are left out.
+
+    :param schema: List of :class:`Field` objects.
+    :param header: List of column headers of the CSV file.
+    :return: Function that converts a row (list of strings) into a dictionary of fields.
+    """
+    positions = {name: index for index, name in enumerate(header)}
+    present = [field for field in schema if field.header in positions]
+    defaults = {field.name: MISSING.get(field.type) for field in schema
+                if field.header not in positions and not field.optional}
+    names = tuple(field.name for field in present)
+    converters = tuple(CONVERTERS[field.type] for field in present)
+    indexes = [positions[field.header] for field in present]
+    getter = itemgetter(*indexes) if len(indexes) > 1 else lambda row: tuple(row[index] for index in indexes)
+    width = len(header)
+
+    def convert(row):
+        if len(row) < width:
+            row = row + [""] * (width - len(row))
+        record = dict(defaults)
+        record.update(izip(names, [converter(value) for converter, value in izip(converters, getter(row))]))
+        return record
+    return convert
+
+
+PERSON_FIELDS = [
+    Field('remote_id', "ID"),
+    Field('first_name', "First Name", 'unicode'),
+    Field('known_first_name', "Known First Name", 'unicode'),
+    Field('middle_name', "Middle Name", 'unicode'),
+    Field('last_name', "Last Name", 'unicode'),
+    Field('second_last_name', "Second Last Name", 'unicode'),
+    Field('nick_name', "Nickname", 'unicode'),
+    Field('name_order', "Name Order"),
+    Field('dob', "Birthdate"),
+    Field('country', "Country", 'unicode')
+]
+
+MATCH_FIELDS = [
+    Field('remote_id', "ID"),
+    Field('competition', "Competition", 'unicode'),
+    Field('season', "Season"),
+    Field('match_date', "Match Date"),
+    Field('match_time', "KO Time"),
+    Field('matchday', "Matchday", 'int'),
+    Field('venue', "Venue", 'unicode'),
+    Field('home_team', "Home Team", 'unicode'),
+    Field('away_team', "Away Team", 'unicode'),
+    Field('home_manager', "Home Manager", 'unicode'),
+    Field('away_manager', "Away Manager", 'unicode'),
+    Field('referee', "Referee", 'unicode'),
+    Field('attendance', "Attendance", 'int'),
+    Field('kickoff_temp', "KO Temp", 'float'),
+    Field('kickoff_humid', "KO Humidity", 'float'),
+    Field('kickoff_wx', "KO Wx"),
+    Field('halftime_wx', "HT Wx"),
+    Field('fulltime_wx', "FT Wx")
+]
+
+
+SCHEMAS = {
+    'suppliers': [
+        Field('name', "Name", 'unicode')
+    ],
+    'countries': [
+        Field('remote_id', "ID"),
+        Field('name', "Name", 'unicode'),
+        Field('code', "Code"),
+        Field('confed', "Confederation")
+    ],
+    'competitions': [
+        Field('remote_id', "ID"),
+        Field('name', "Name", 'unicode'),
+        Field('level', "Level", 'int'),
+        Field('country', "Country", 'unicode', optional=True),
+        Field('confed', "Confederation", optional=True)
+    ],
+    'venues': [
+        Field('remote_id', "ID"),
+        Field('name', "Venue Name", 'unicode'),
+        Field('city', "City", 'unicode'),
+        Field('region', "Region", 'unicode'),
+        Field('country', "Country", 'unicode'),
+        Field('timezone', "Timezone", 'unicode'),
+        Field('latitude', "Latitude", 'float'),
+        Field('longitude', "Longitude", 'float'),
+        Field('altitude', "Altitude", 'int'),
+        Field('config_date', "Config Date"),
+        Field('surface', "Surface", 'unicode'),
+        Field('length', "Length", 'int'),
+        Field('width', "Width", 'int'),
+        Field('capacity', "Capacity", 'int'),
+        Field('seats', "Seats", 'int')
+    ],
+    'surfaces': [
+        Field('description', "Description", 'unicode'),
+        Field('surface_type', "Type")
+    ],
+    'timezones': [
+        Field('name', "Name", 'unicode'),
+        Field('confed', "Confederation"),
+        Field('offset', "Offset", 'float')
+    ],
+    'clubs': [
+        Field('remote_id', "ID"),
+        Field('name', "Name", 'unicode'),
+        Field('short_name', "Short Name", 'unicode'),
+        Field('country', "Country", 'unicode')
+    ],
+    'managers': PERSON_FIELDS,
+    'referees': PERSON_FIELDS,
+    'players': PERSON_FIELDS + [
+        Field('position_name', "Position", 'unicode')
+    ],
+    'positions': [
+        Field('remote_id', "ID"),
+        Field('name', "Position", 'unicode'),
+        Field('position_type', "Type")
+    ],
+    'league_matches': MATCH_FIELDS,
+    'group_matches': MATCH_FIELDS[:5] + [
+        Field('group_round', "Group Round"),
+        Field('group', "Group")
+    ] + MATCH_FIELDS[5:],
+    'knockout_matches': MATCH_FIELDS[:5] + [
+        Field('knockout_round', "Knockout Round")
+    ] + MATCH_FIELDS[5:] + [
+        Field('extra_time', "Extra Time", 'bool')
+    ],
+    'match_lineups': [
+        Field('competition', "Competition", 'unicode'),
+        Field('season', "Season"),
+        Field('matchday', "Matchday", 'int'),
+        Field('home_team', "Home Team", 'unicode'),
+        Field('away_team', "Away Team", 'unicode'),
+        Field('player_team', "Player's Team", 'unicode'),
+        Field('player_name', "Player", 'unicode'),
+        Field('starter', "Starting", 'bool'),
+        Field('captain', "Captain", 'bool')
+    ],
+    'modifiers': [
+        Field('modifier', "Modifier"),
+        Field('modifier_category', "Category")
+    ]
+}
@@ -2,21 +2,44 @@ import os
 
 from lxml import etree
 
+from marcottievents.etl.base.compression import open_feed
+
 
 class BaseXML(object):
     """
     Base class for data extraction from XML data feeds.
     """
-    def __init__(self, settings):
+    def __init__(self, settings, ledger=None):
         self.directory = settings.XML_DATA_DIR
         self.data_file = settings.XML_FILE
+        self.ledger = ledger
         self.supplier = None
         self.feed_class = None
 
-    def extract(self):
+    def extract(self, *entities):
+        """
+        Parse XML data file into feed elements.
+
+        If the extractor has an ingestion ledger and the file has not changed since it was last
+        ingested for the data entities, the file is not parsed and an empty feed element without
+        children is returned.  The data entities are the names of the workflows that load the data
+        read from the file; the file is committed to the ledger once all of them have been loaded.
+
+        Files compressed with gzip, bzip2 or xz, and members of zip archives (given as
+        'archive.zip/member.xml'), are decompressed while they are parsed.
+
+        :param entities: Names of data entities that are loaded from the file.
+        :return: Root feed element.
+        """
         filename = os.path.join(self.directory, self.data_file)
+        if self.ledger is not None:
+            if not entities:
+                raise ValueError("Data entities of XML file are required by the ingestion ledger")
+            if not self.ledger.changed(filename, list(entities)):
+                return FeedElement()
         target_parser = FeedParser(self.feed_class)
-        root_elements = etree.parse(filename, etree.XMLParser(target=target_parser))
+        with open_feed(filename) as f:
+            root_elements = etree.parse(f, etree.XMLParser(target=target_parser))
         return root_elements[0]
 
 
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from sqlalchemy import Column, BigInteger, DateTime, Float, Integer, String, Sequence, ForeignKey, Unicode, Index
+from sqlalchemy.orm import relationship, backref
+
+from marcottievents.models import GUID
+from marcottievents.models.common import BaseSchema
+
+
+class IngestionLedger(BaseSchema):
+    """
+    Ingestion ledger data model.
+
+    Records the data feed files that have been extracted and loaded into the database, with the
+    file fingerprint (size, modification time, content hash) at the time of ingestion.
+    """
+    __tablename__ = "ingestion_ledger"
+    __table_args__ = (Index('ingestion_ledger_indx', 'entity', 'supplier_id', 'path'),)
+
+    id = Column(Integer, Sequence('ingestion_id_seq', start=1), primary_key=True)
+    path = Column(Unicode, nullable=False)
+    entity = Column(String(40), nullable=False)
+    size = Column(BigInteger)
+    mtime = Column(Float)
+    content_hash = Column(String(64))
+    ingested_at = Column(DateTime, default=datetime.utcnow)
+
+    supplier_id = Column(Integer, ForeignKey('suppliers.id'))
+    supplier = relationship('Suppliers', backref=backref('ingested_files'))
+
+    def __repr__(self):
+        return u"<IngestionLedger(path={0}, entity={1}, size={2}, hash={3})>".format(
+            self.path, self.entity, self.size, self.content_hash).encode('utf-8')
+
+
+class LoadCheckpoints(BaseSchema):
+    """
+    Load checkpoint data model.
+
+    Records the chunks of match data that have been loaded and committed to the database, with the
+    batch size of the load and the row count and content hash of the chunk, so that an interrupted
+    load of the same data can be resumed after the last committed chunk.
+    """
+    __tablename__ = "load_checkpoints"
+    __table_args__ = (Index('load_checkpoints_indx', 'entity', 'supplier_id', 'match_id'),)
+
+    id = Column(Integer, Sequence('checkpoint_id_seq', start=1), primary_key=True)
+    entity = Column(String(40), nullable=False)
+    chunk = Column(Integer, nullable=False)
+    batch_size = Column(Integer)
+    row_count = Column(Integer)
+    content_hash = Column(String(64))
+    completed_at = Column(DateTime, default=datetime.utcnow)
+
+    match_id = Column(GUID, ForeignKey('matches.id'))
+    supplier_id = Column(Integer, ForeignKey('suppliers.id'))
+    supplier = relationship('Suppliers', backref=backref('checkpoints'))
+
+    def __repr__(self):
+        return "<LoadCheckpoint(entity={0}, match={1}, chunk={2})>".format(self.entity, self.match_id, self.chunk)
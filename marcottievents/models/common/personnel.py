@@ -1,6 +1,6 @@
 import uuid
 
-from sqlalchemy import Column, Integer, Numeric, String, Sequence, Date, ForeignKey, Unicode, Index
+from sqlalchemy import Column, Integer, Numeric, String, Sequence, Date, ForeignKey, Unicode, Index, event
 from sqlalchemy.ext.hybrid import hybrid_property, hybrid_method
 from sqlalchemy.orm import relationship, backref
 from sqlalchemy.schema import CheckConstraint
@@ -11,6 +11,33 @@ from marcottievents.models.common import BaseSchema
 import marcottievents.models.common.enums as enums
 
 
+def compose_full_name(first_name, last_name, known_first_name=None, middle_name=None, nick_name=None,
+                      order=None):
+    """
+    Compose a person's commonly known full name, following naming order conventions.
+
+    This is the value of the :attr:`Persons.full_name` property and of the indexed
+    :attr:`Persons.search_name` column.
+
+    :param first_name: First name.
+    :param last_name: Last name.
+    :param known_first_name: Alternate first name by which the person is known, or None.
+    :param middle_name: Middle name, or None.
+    :param nick_name: Nickname, or None.
+    :param order: Naming order (NameOrderType), or None for Western order.
+    :return: Person's full name.  Missing name parts are left out.
+    """
+    if nick_name:
+        return nick_name
+    if order == enums.NameOrderType.eastern:
+        names = [last_name, first_name]
+    elif order == enums.NameOrderType.middle:
+        names = [known_first_name or first_name, middle_name, last_name]
+    else:
+        names = [known_first_name or first_name, last_name]
+    return u" ".join(name for name in names if name)
+
+
 class Positions(BaseSchema):
     """
     Football player position data model.
@@ -40,6 +67,7 @@ class Persons(BaseSchema):
     nick_name = Column(Unicode(40))
     birth_date = Column(Date)
     order = Column(enums.NameOrderType.db_type(), default=enums.NameOrderType.western)
+    search_name = Column(Unicode(170))
     type = Column(String)
 
     country_id = Column(GUID, ForeignKey('countries.id'))
@@ -64,16 +92,8 @@ class Persons(BaseSchema):
 
         :return: Person's full name.
         """
-        if all([self.nick_name is not None, self.nick_name != u'']):
-            return self.nick_name
-        else:
-            if self.order == enums.NameOrderType.western:
-                return u"{} {}".format(self.known_first_name or self.first_name, self.last_name)
-            elif self.order == enums.NameOrderType.middle:
-                return u"{} {} {}".format(self.known_first_name or self.first_name,
-                                          self.middle_name, self.last_name)
-            elif self.order == enums.NameOrderType.eastern:
-                return u"{} {}".format(self.last_name, self.first_name)
+        return compose_full_name(self.first_name, self.last_name, known_first_name=self.known_first_name,
+                                 middle_name=self.middle_name, nick_name=self.nick_name, order=self.order)
 
     @full_name.expression
     def full_name(cls):
@@ -169,6 +189,18 @@ class Persons(BaseSchema):
             self.full_name, self.country.name, self.birth_date.isoformat()).encode('utf-8')
 
 
+Index('persons_name_indx', Persons.search_name)
+
+
+@event.listens_for(Persons, 'before_insert', propagate=True)
+@event.listens_for(Persons, 'before_update', propagate=True)
+def update_search_name(mapper, connection, target):
+    """
+    Keep the persisted full name of a person in step with the name fields.
+    """
+    target.search_name = target.full_name
+
+
 class Players(Persons):
     """
     Players data model.
@@ -0,0 +1,57 @@
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.orm import Session
+from clint.textui import prompt
+
+from marcottievents.models.common.personnel import Persons, compose_full_name
+
+
+def add_search_names(engine, batch_size=1000):
+    """
+    Upgrade the persons table of a database that was created before persons had a search name.
+
+    The search name column and its index are added if they are missing, and the search names of
+    persons that have none are composed from their name fields, one batch of persons at a time.
+
+    :param engine: Database engine.
+    :param batch_size: Number of persons updated per transaction.
+    :return: Number of persons whose search names were filled in.
+    """
+    table = Persons.__table__
+    inspector = inspect(engine)
+    if 'search_name' not in [column['name'] for column in inspector.get_columns(table.name)]:
+        engine.execute("ALTER TABLE {} ADD COLUMN search_name {}".format(
+            table.name, table.c.search_name.type.compile(dialect=engine.dialect)))
+    indexes = [index['name'] for index in inspector.get_indexes(table.name)]
+    for index in table.indexes:
+        if index.name not in indexes:
+            index.create(engine)
+
+    session = Session(engine)
+    count = 0
+    try:
+        while True:
+            rows = session.query(Persons.person_id, Persons.first_name, Persons.last_name,
+                                 Persons.known_first_name, Persons.middle_name, Persons.nick_name,
+                                 Persons.order).filter(Persons.search_name == None).limit(batch_size).all()
+            if not rows:
+                break
+            session.bulk_update_mappings(Persons, [
+                dict(person_id=person_id, search_name=compose_full_name(*names)) for person_id, names in
+                ((row[0], row[1:]) for row in rows)])
+            session.commit()
+            count += len(rows)
+    finally:
+        session.close()
+    return count
+
+
+def main():
+    """
+    Main database upgrade function exposed as script command.
+    """
+    print("#### Marcotti-Events database upgrade ####")
+    uri = prompt.query('Database URI:')
+    engine = create_engine(uri)
+    count = add_search_names(engine)
+    print("Filled in search names of {} persons".format(count))
+    print("#### Upgrade complete ####")
@@ -2,11 +2,11 @@ import sys
 from setuptools import setup, find_packages
 
 
-REQUIRES = ['SQLAlchemy>=1.0.9',
+REQUIRES = ['SQLAlchemy>=1.1.0',
             'jinja2>=2.7',
             'clint>=0.4.0',
             'lxml>=3.5.0',
-            'pandas>=0.16.0']
+            'pandas>=0.20.0']
 needs_pytest = {'pytest', 'test', 'ptr'}.intersection(sys.argv)
 pytest_runner = ['pytest_runner'] if needs_pytest else []
 exec(open('marcottievents/version.py').read())
@@ -21,7 +21,8 @@ setup(
     entry_points={
         'console_scripts': [
             'dbsetup = marcottievents.tools.dbsetup:main',
-            'testsetup = marcottievents.tools.testsetup:main'
+            'testsetup = marcottievents.tools.testsetup:main',
+            'dbupgrade = marcottievents.tools.dbupgrade:main'
         ]
     },
     url='https://github.com/soccermetrics/marcotti-events',
@@ -36,7 +37,8 @@ setup(
         'MySQL': ['mysql-python>=1.2.3'],
         'MSSQL': ['pyodbc>=3.0'],
         'Oracle': ['cx_oracle>=5.0'],
-        'Firebird': ['fdb>=1.6']
+        'Firebird': ['fdb>=1.6'],
+        'XZ': ['backports.lzma>=0.0.6']
     },
     tests_require=['pytest>=2.8.2'],
     description='Data modeling software library for capture of micro events in football matches',
@@ -0,0 +1,118 @@
+# coding=utf-8
+import uuid
+from datetime import date
+
+from sqlalchemy import MetaData, Table, Column, Integer, String
+from sqlalchemy.dialects import postgresql
+
+import marcottievents.models.common.enums as enums
+import marcottievents.models.common.overview as mco
+import marcottievents.models.common.personnel as mcp
+import marcottievents.models.common.suppliers as mcs
+from marcottievents.etl.base.bulk import BulkWriter, CopyWriter, bulk_writer, insert_ignore
+
+
+class PostgresSession(object):
+    """Stand-in session that only supplies the PostgreSQL dialect."""
+
+    class Bind(object):
+        dialect = postgresql.dialect()
+
+    def get_bind(self):
+        return self.Bind()
+
+
+def test_bulk_writer_single_table(session):
+    """Bulk 001: Write data mappings of a single-table model with default values."""
+    writer = BulkWriter(session)
+    writer.save(mco.Countries, [dict(name=u"Portugal", code="POR", confederation=enums.ConfederationType.europe),
+                                dict(name=u"Curaçao", confederation=enums.ConfederationType.north_america)])
+
+    records = session.query(mco.Countries).order_by(mco.Countries.name).all()
+    assert [record.name for record in records] == [u"Curaçao", u"Portugal"]
+    assert records[0].code is None
+    assert all(isinstance(record.id, uuid.UUID) for record in records)
+
+
+def test_bulk_writer_joined_inheritance(session):
+    """Bulk 002: Write data mappings of a joined-inheritance model to base and subclass tables."""
+    country = mco.Countries(name=u"Portugal", confederation=enums.ConfederationType.europe)
+    position = mcp.Positions(name=u"Forward", type=enums.PositionType.forward)
+    session.add_all([country, position])
+    session.commit()
+
+    writer = BulkWriter(session)
+    writer.save(mcp.Players, [dict(person_id=uuid.uuid4(), first_name=u"Cristiano", last_name=u"Ronaldo",
+                                   birth_date=date(1985, 2, 5), country_id=country.id, position_id=position.id)])
+
+    player = session.query(mcp.Players).one()
+    assert player.full_name == u"Cristiano Ronaldo"
+    assert player.type == 'players'
+    assert player.order == enums.NameOrderType.western
+    assert player.position.name == u"Forward"
+
+
+def test_bulk_writer_table_rows():
+    """Bulk 003: Split data mappings into complete rows of the tables of a model hierarchy."""
+    person_id = uuid.uuid4()
+    table_rows = BulkWriter.table_rows(mcp.Players, [dict(person_id=person_id, first_name=u"John",
+                                                          last_name=u"Doe")])
+
+    assert [table.name for table, _ in table_rows] == ['persons', 'players']
+    (_, person_rows), (_, player_rows) = table_rows
+    assert person_rows[0]['person_id'] == person_id
+    assert person_rows[0]['type'] == 'players'
+    assert person_rows[0]['nick_name'] is None
+    assert player_rows[0]['person_id'] == person_id
+    assert isinstance(player_rows[0]['id'], uuid.UUID)
+
+
+def test_bulk_writer_empty_mappings(session):
+    """Bulk 004: Write nothing if there are no data mappings."""
+    BulkWriter(session).save(mco.Countries, [])
+    assert session.query(mco.Countries).count() == 0
+
+
+def test_copy_writer_statement():
+    """Bulk 005: Compose COPY statement with schema-qualified and quoted identifiers."""
+    table = Table('Match Notes', MetaData(), Column('id', Integer), Column('order', String), schema='stats')
+    writer = CopyWriter(PostgresSession())
+
+    assert writer.statement(table, list(table.columns)) == \
+        "COPY stats.\"Match Notes\" (id, \"order\") FROM STDIN WITH CSV NULL '\\N'"
+    assert writer.statement(mco.Countries.__table__, [mco.Countries.__table__.c.name]) == \
+        "COPY countries (name) FROM STDIN WITH CSV NULL '\\N'"
+
+
+def test_copy_writer_text():
+    """Bulk 006: Format database values for the CSV buffer of a COPY statement."""
+    writer = CopyWriter(PostgresSession())
+
+    assert writer._text(None) == r'\N'
+    assert writer._text(u"Málaga") == u"Málaga".encode('utf-8')
+    assert writer._text(True) == 't' and writer._text(False) == 'f'
+    assert writer._text(date(2016, 5, 15)) == '2016-05-15'
+    assert writer._text(0.1 + 0.2) == '0.30000000000000004'
+    assert float(writer._text(51.555583333333336)) == 51.555583333333336
+    assert writer._text(42) == '42'
+
+
+def test_bulk_writer_dialect():
+    """Bulk 007: Create COPY writer for PostgreSQL databases."""
+    assert type(bulk_writer(PostgresSession())) is CopyWriter
+
+
+def test_insert_ignore_existing_keys(session):
+    """Bulk 008: Insert data mappings and skip those whose primary key is in the table."""
+    supplier = mcs.Suppliers(name=u"Opta")
+    countries = [mco.Countries(name=name, confederation=enums.ConfederationType.europe)
+                 for name in [u"Portugal", u"Spain", u"Wales"]]
+    session.add_all([supplier] + countries)
+    session.commit()
+
+    insert_ignore(session, mcs.CountryMap, [dict(id=countries[0].id, remote_id='1', supplier_id=supplier.id)])
+    insert_ignore(session, mcs.CountryMap, [dict(id=country.id, remote_id=str(indx), supplier_id=supplier.id)
+                                           for indx, country in enumerate(countries, start=1)])
+
+    records = {record.remote_id: record.id for record in session.query(mcs.CountryMap)}
+    assert records == {'1': countries[0].id, '2': countries[1].id, '3': countries[2].id}
@@ -0,0 +1,84 @@
+# coding=utf-8
+import pandas as pd
+
+import marcottievents.models.common.enums as enums
+import marcottievents.models.common.overview as mco
+from marcottievents.etl.base.cache import KeySet
+
+
+def test_keyset_missing_rows(session):
+    """KeySet 001: Select data rows whose natural keys are not in the database."""
+    session.add_all([mco.Years(yr=yr) for yr in [2010, 2011]])
+    session.commit()
+
+    year_keys = KeySet(session, mco.Years, ['yr'])
+    data_frame = pd.DataFrame({'yr': [2009, 2010, 2011, 2012]})
+    missing = year_keys.missing(data_frame)
+
+    assert missing['yr'].tolist() == [2009, 2012]
+    assert missing.index.tolist() == [0, 3]
+    assert year_keys.get((2010,)) is not None
+    assert year_keys.get((2009,)) is None
+    assert (2009,) in year_keys and (2012,) in year_keys
+
+
+def test_keyset_duplicate_rows(session):
+    """KeySet 002: Select data rows with duplicate natural keys once."""
+    year_keys = KeySet(session, mco.Years, ['yr'])
+    data_frame = pd.DataFrame({'yr': [2014, 2015, 2014, 2015, 2016]})
+
+    assert year_keys.missing(data_frame).index.tolist() == [0, 1, 4]
+    assert year_keys.missing(data_frame).empty
+
+
+def test_keyset_missing_key_fields(session):
+    """KeySet 003: Verify that empty key fields match only database records with NULL fields."""
+    session.add_all([
+        mco.Countries(name=u"Portugal", code="POR", confederation=enums.ConfederationType.europe),
+        mco.Countries(name=u"Wales", confederation=enums.ConfederationType.europe)
+    ])
+    session.commit()
+
+    country_keys = KeySet(session, mco.Countries, ['name', 'code'])
+    data_frame = pd.DataFrame({'name': [u"Portugal", u"Portugal", u"Wales", u"Wales", u"São Tomé"],
+                               'code': ["POR", None, None, "WAL", None]})
+
+    assert country_keys.missing(data_frame).index.tolist() == [1, 3, 4]
+
+
+def test_keyset_absent_key_columns(session):
+    """KeySet 004: Verify that key fields that are not data frame columns take empty values."""
+    session.add(mco.Countries(name=u"Wales", confederation=enums.ConfederationType.europe))
+    session.commit()
+
+    country_keys = KeySet(session, mco.Countries, ['name', 'code'])
+    data_frame = pd.DataFrame({'name': [u"Wales", u"Scotland"]})
+
+    assert country_keys.frame_keys(data_frame) == [(u"Wales", None), (u"Scotland", None)]
+    assert country_keys.missing(data_frame)['name'].tolist() == [u"Scotland"]
+
+
+def test_keyset_complete_prefetch(session):
+    """KeySet 005: Retrieve all natural keys of a model and skip later lookups."""
+    session.add_all([mco.Years(yr=yr) for yr in [2010, 2011]])
+    session.commit()
+
+    year_keys = KeySet(session, mco.Years, ['yr'])
+    year_keys.prefetch()
+    assert year_keys.complete
+    assert len(year_keys) == 2
+
+    session.add(mco.Years(yr=2012))
+    session.commit()
+    year_keys.prefetch([(2012,)])
+    assert (2012,) not in year_keys
+
+
+def test_keyset_staged_keys(session):
+    """KeySet 006: Add natural keys of staged records with their local IDs."""
+    year_keys = KeySet(session, mco.Years, ['yr'])
+    year_keys.add((2020,), 150)
+
+    assert year_keys.key({'yr': 2020}) == (2020,)
+    assert year_keys.get((2020,)) == 150
+    assert year_keys.missing(pd.DataFrame({'yr': [2020]})).empty
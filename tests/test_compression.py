@@ -0,0 +1,90 @@
+# coding=utf-8
+import os
+import bz2
+import gzip
+import zipfile
+
+import pytest
+
+from marcottievents.etl.base.compression import compression, feed_files, feed_stat, open_feed, split_member
+
+
+CONTENTS = "ID,Name\n1,Portugal\n2,Spain\n"
+
+
+@pytest.fixture
+def feed_dir(tmpdir):
+    directory = str(tmpdir)
+    with open(os.path.join(directory, 'countries_1.csv'), 'wb') as f:
+        f.write(CONTENTS)
+    with gzip.open(os.path.join(directory, 'countries_2.csv.gz'), 'wb') as f:
+        f.write(CONTENTS)
+    f = bz2.BZ2File(os.path.join(directory, 'countries_3.csv'), 'wb')
+    f.write(CONTENTS)
+    f.close()
+    with zipfile.ZipFile(os.path.join(directory, 'countries_4.csv.zip'), 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('countries_4.csv', CONTENTS)
+    with zipfile.ZipFile(os.path.join(directory, 'season.zip'), 'w', zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('countries_5.csv', CONTENTS)
+        zf.writestr('2016/countries_6.csv', CONTENTS)
+        zf.writestr('readme.txt', "Feed archive")
+    return directory
+
+
+def relative(directory, paths):
+    return [os.path.relpath(path, directory) for path in paths]
+
+
+def test_compression_formats(feed_dir):
+    """Compression 001: Identify compression format by file extension or magic bytes."""
+    assert compression(os.path.join(feed_dir, 'countries_1.csv')) is None
+    assert compression(os.path.join(feed_dir, 'countries_2.csv.gz')) == 'gzip'
+    assert compression(os.path.join(feed_dir, 'countries_3.csv')) == 'bz2'
+    assert compression(os.path.join(feed_dir, 'season.zip')) == 'zip'
+
+
+def test_feed_files_compressed(feed_dir):
+    """Compression 002: List plain and compressed data files that match a pattern."""
+    assert relative(feed_dir, feed_files(os.path.join(feed_dir, 'countries_*.csv'))) == [
+        'countries_1.csv', 'countries_2.csv.gz', 'countries_3.csv', 'countries_4.csv.zip/countries_4.csv']
+
+
+def test_feed_files_archive_members(feed_dir):
+    """Compression 003: List members of zip archives only if the pattern names the archive."""
+    assert relative(feed_dir, feed_files(os.path.join(feed_dir, 'season.zip', 'countries_*.csv'))) == [
+        'season.zip/countries_5.csv']
+    assert relative(feed_dir, feed_files(os.path.join(feed_dir, 'season.zip', '2016', '*.csv'))) == [
+        'season.zip/2016/countries_6.csv']
+    assert relative(feed_dir, feed_files(os.path.join(feed_dir, 'season.zip'))) == [
+        'season.zip/2016/countries_6.csv', 'season.zip/countries_5.csv', 'season.zip/readme.txt']
+    assert feed_files(os.path.join(feed_dir, 'other.zip', '*.csv')) == []
+
+
+def test_open_feed(feed_dir):
+    """Compression 004: Read decompressed contents of data files and zip archive members."""
+    for name in ['countries_1.csv', 'countries_2.csv.gz', 'countries_3.csv', 'countries_4.csv.zip',
+                 os.path.join('season.zip', 'countries_5.csv'), os.path.join('season.zip', '2016', 'countries_6.csv')]:
+        with open_feed(os.path.join(feed_dir, name)) as f:
+            assert f.read() == CONTENTS
+
+
+def test_open_feed_multiple_members_error(feed_dir):
+    """Compression 005: Verify error if zip archive with several members is opened as one file."""
+    with pytest.raises(IOError):
+        open_feed(os.path.join(feed_dir, 'season.zip'))
+
+
+def test_split_member(feed_dir):
+    """Compression 006: Split paths of zip archive members into archive path and member name."""
+    archive = os.path.join(feed_dir, 'season.zip')
+    assert split_member(os.path.join(archive, '2016', 'countries_6.csv')) == (archive, '2016/countries_6.csv')
+    assert split_member(archive) == (archive, None)
+    assert split_member(os.path.join(feed_dir, 'countries_1.csv', 'x')) == \
+        (os.path.join(feed_dir, 'countries_1.csv', 'x'), None)
+
+
+def test_feed_stat(feed_dir):
+    """Compression 007: Return uncompressed size of zip archive members."""
+    size, mtime = feed_stat(os.path.join(feed_dir, 'season.zip', 'countries_5.csv'))
+    assert size == len(CONTENTS)
+    assert mtime == os.stat(os.path.join(feed_dir, 'season.zip')).st_mtime
@@ -0,0 +1,92 @@
+# coding=utf-8
+import os
+
+import pandas as pd
+import pytest
+
+from marcottievents.etl.ecsv import CSVExtractor
+from marcottievents.etl.ecsv.base import extract
+
+
+class FeedExtractor(CSVExtractor):
+    """Extractor of a data entity without a schema."""
+
+    @extract
+    def officials(self, *args, **kwargs):
+        for row in kwargs.get('data'):
+            yield dict(name=self.column_unicode("Name", **row), matches=self.column_int("Matches", **row))
+
+
+@pytest.fixture
+def feed_dir(tmpdir):
+    directory = str(tmpdir)
+    with open(os.path.join(directory, 'competitions_1.csv'), 'wb') as f:
+        f.write("ID,Name,Level,Country\n"
+                "10, Primeira Liga ,1,Portugal\n"
+                "11,Segunda Liga,,Portugal\n")
+    with open(os.path.join(directory, 'competitions_2.csv'), 'wb') as f:
+        f.write("ID,Name,Level\n"
+                "12,Taça da Liga,2\n")
+    with open(os.path.join(directory, 'officials.csv'), 'wb') as f:
+        f.write("Name,Matches\n"
+                "Artur Soares Dias ,12\n"
+                "Jorge Sousa,\n")
+    return directory
+
+
+def test_python_engine(feed_dir):
+    """CSV 001: Extract data of an entity with a schema as a list of dictionaries."""
+    records = CSVExtractor(feed_dir).competitions(('competitions_*.csv',))
+
+    assert records == [
+        dict(remote_id='10', name=u"Primeira Liga", level=1, country=u"Portugal"),
+        dict(remote_id='11', name=u"Segunda Liga", level=None, country=u"Portugal"),
+        dict(remote_id='12', name=u"Taça da Liga", level=2)
+    ]
+
+
+def test_pandas_engine(feed_dir):
+    """CSV 002: Extract data of an entity with a schema as a DataFrame with the pandas engine."""
+    data_frame = CSVExtractor(feed_dir, engine='pandas').competitions(('competitions_*.csv',))
+
+    assert isinstance(data_frame, pd.DataFrame)
+    assert data_frame['remote_id'].tolist() == ['10', '11', '12']
+    assert data_frame['name'].tolist() == [u"Primeira Liga", u"Segunda Liga", u"Taça da Liga"]
+    assert data_frame['level'].tolist()[::2] == [1, 2]
+    assert pd.isnull(data_frame['level'][1])
+    assert data_frame['country'].tolist()[:2] == [u"Portugal", u"Portugal"]
+    assert pd.isnull(data_frame['country'][2])
+
+
+def test_engines_chunks(feed_dir):
+    """CSV 003: Stream data of an entity in chunks of rows across files with both engines."""
+    chunks = list(CSVExtractor(feed_dir).competitions(('competitions_*.csv',), chunk_size=2))
+    frames = list(CSVExtractor(feed_dir, engine='pandas').competitions(('competitions_*.csv',), chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert [len(frame) for frame in frames] == [2, 1]
+    assert [record['remote_id'] for chunk in chunks for record in chunk] == \
+        [remote_id for frame in frames for remote_id in frame['remote_id']]
+
+
+@pytest.mark.parametrize('engine', CSVExtractor.ENGINES)
+def test_engines_invalid_int_error(feed_dir, engine):
+    """CSV 004: Verify error if an integer field holds a value that is not an integer."""
+    with open(os.path.join(feed_dir, 'competitions_3.csv'), 'wb') as f:
+        f.write("ID,Name,Level\n13,Taça de Portugal,first\n")
+    with pytest.raises(ValueError):
+        CSVExtractor(feed_dir, engine=engine).competitions(('competitions_3.csv',))
+
+
+@pytest.mark.parametrize('engine', CSVExtractor.ENGINES)
+def test_entity_without_schema(feed_dir, engine):
+    """CSV 005: Pass rows keyed by column header to extractors of entities without a schema."""
+    records = FeedExtractor(feed_dir, engine=engine).officials(('officials.csv',))
+
+    assert records == [dict(name=u"Artur Soares Dias", matches=12), dict(name=u"Jorge Sousa", matches=None)]
+
+
+def test_invalid_engine_error(feed_dir):
+    """CSV 006: Verify error if the extractor engine is unknown."""
+    with pytest.raises(ValueError):
+        CSVExtractor(feed_dir, engine='spark')
@@ -0,0 +1,108 @@
+# coding=utf-8
+import os
+
+import pytest
+
+import marcottievents.models.common.overview as mco
+import marcottievents.models.common.ingestion as mci
+from marcottievents.etl import ETL, FeedLedger, MarcottiLoad, MarcottiTransform
+from marcottievents.etl.exml import BaseXML, FeedElement
+
+
+class Venue(FeedElement):
+    pass
+
+
+class Stadium(FeedElement):
+    Venue = Venue
+
+
+class Feed(object):
+    Stadium = Stadium
+
+
+class VenueXML(BaseXML):
+    """Extractor of time zones and playing surfaces from a single XML file."""
+
+    def __init__(self, settings, ledger=None):
+        super(VenueXML, self).__init__(settings, ledger)
+        self.feed_class = Feed
+
+    def timezones(self, root):
+        return [dict(name=venue.attributes['timezone'].decode('utf-8'), offset=float(venue.attributes['offset']),
+                     confed=venue.attributes['confed'])
+                for venue in root.get_children(Venue)]
+
+    def surfaces(self, root):
+        return [dict(description=venue.attributes['surface'].decode('utf-8'),
+                     surface_type=venue.attributes['surface_type'])
+                for venue in root.get_children(Venue)]
+
+
+class Settings(object):
+    XML_FILE = 'venues.xml'
+
+    def __init__(self, directory):
+        self.XML_DATA_DIR = directory
+
+
+@pytest.fixture
+def settings(tmpdir):
+    with open(os.path.join(str(tmpdir), Settings.XML_FILE), 'wb') as f:
+        f.write('<Document><Stadium>'
+                '<Venue timezone="Western European Time" offset="0" confed="UEFA" '
+                'surface="Grass" surface_type="Natural"/>'
+                '<Venue timezone="Central European Time" offset="1" confed="UEFA" '
+                'surface="Hybrid grass" surface_type="Hybrid"/>'
+                '</Stadium></Document>')
+    return Settings(str(tmpdir))
+
+
+def test_xml_extract(settings):
+    """XML 001: Parse XML data file into tree of feed elements."""
+    root = VenueXML(settings).extract()
+
+    assert isinstance(root, Stadium)
+    assert [venue.attributes['surface'] for venue in root.get_children(Venue)] == ["Grass", "Hybrid grass"]
+
+
+def test_xml_ledger_unchanged_file(session, settings):
+    """XML 002: Commit XML file to ledger after all its entities load, and skip it when unchanged."""
+    ledger = FeedLedger(session)
+    etl = ETL(session=session, supplier=None, transform=MarcottiTransform, load=MarcottiLoad, ledger=ledger)
+    xml = VenueXML(settings, ledger=ledger)
+
+    root = xml.extract('timezones', 'surfaces')
+    etl.workflow('timezones', xml.timezones(root))
+    assert session.query(mci.IngestionLedger).count() == 0
+    etl.workflow('surfaces', xml.surfaces(root))
+    assert sorted(record.entity for record in session.query(mci.IngestionLedger)) == ['surfaces', 'timezones']
+
+    root = xml.extract('timezones', 'surfaces')
+    assert root.children == []
+    etl.workflow('timezones', xml.timezones(root))
+    etl.workflow('surfaces', xml.surfaces(root))
+    assert session.query(mco.Timezones).count() == 2
+    assert session.query(mco.Surfaces).count() == 2
+
+
+def test_xml_ledger_failed_entity(session, settings):
+    """XML 003: Discard XML file from ledger for all its entities if one of them fails to load."""
+    ledger = FeedLedger(session)
+    etl = ETL(session=session, supplier=None, transform=MarcottiTransform, load=MarcottiLoad, ledger=ledger)
+    xml = VenueXML(settings, ledger=ledger)
+
+    root = xml.extract('timezones', 'surfaces')
+    etl.workflow('timezones', xml.timezones(root))
+    with pytest.raises(ValueError):
+        etl.workflow('surfaces', [dict(row, surface_type='Clay') for row in xml.surfaces(root)])
+    assert session.query(mci.IngestionLedger).count() == 0
+
+    root = xml.extract('timezones', 'surfaces')
+    assert len(root.get_children(Venue)) == 2
+
+
+def test_xml_ledger_entities_error(session, settings):
+    """XML 004: Verify error if XML file is extracted with a ledger but without data entities."""
+    with pytest.raises(ValueError):
+        VenueXML(settings, ledger=FeedLedger(session)).extract()
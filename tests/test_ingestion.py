@@ -0,0 +1,75 @@
+# coding=utf-8
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import marcottievents.models.common.suppliers as mcs
+import marcottievents.models.common.ingestion as mci
+
+
+def test_ingestion_ledger_insert(session):
+    """Ingestion 001: Insert ingestion ledger record and verify data."""
+    supplier = mcs.Suppliers(name=u"Opta")
+    session.add(mci.IngestionLedger(path=u"/data/feeds/lineups_001.csv", entity='match_lineups', size=2048,
+                                    mtime=1451606400.5, content_hash='ab' * 32, supplier=supplier))
+
+    record = session.query(mci.IngestionLedger).one()
+    assert record.supplier.name == u"Opta"
+    assert record.size == 2048
+    assert record.mtime == 1451606400.5
+    assert record.ingested_at is not None
+    assert repr(record) == "<IngestionLedger(path=/data/feeds/lineups_001.csv, entity=match_lineups, " \
+                           "size=2048, hash={})>".format('ab' * 32)
+
+
+def test_ingestion_ledger_zip_member_insert(session):
+    """Ingestion 002: Insert ingestion ledger record of zip archive member with non-ASCII path."""
+    session.add(mci.IngestionLedger(path=u"/data/feeds/Málaga.zip/events.csv", entity='events'))
+
+    record = session.query(mci.IngestionLedger).one()
+    assert record.path == u"/data/feeds/Málaga.zip/events.csv"
+    assert record.supplier is None
+
+
+def test_ingestion_ledger_missing_path_error(session):
+    """Ingestion 003: Verify error if path is missing from ingestion ledger record."""
+    session.add(mci.IngestionLedger(entity='events'))
+    with pytest.raises(IntegrityError):
+        session.commit()
+
+
+def test_ingestion_ledger_missing_entity_error(session):
+    """Ingestion 004: Verify error if data entity is missing from ingestion ledger record."""
+    session.add(mci.IngestionLedger(path=u"/data/feeds/events.csv"))
+    with pytest.raises(IntegrityError):
+        session.commit()
+
+
+def test_load_checkpoint_insert(session):
+    """Ingestion 005: Insert load checkpoint record and verify data."""
+    supplier = mcs.Suppliers(name=u"Opta")
+    session.add(mci.LoadCheckpoints(entity='actions', chunk=2, batch_size=500, row_count=137,
+                                    content_hash='cd' * 32, supplier=supplier))
+
+    record = session.query(mci.LoadCheckpoints).one()
+    assert record.supplier.name == u"Opta"
+    assert (record.chunk, record.batch_size, record.row_count) == (2, 500, 137)
+    assert record.content_hash == 'cd' * 32
+    assert record.completed_at is not None
+    assert repr(record) == "<LoadCheckpoint(entity=actions, match=None, chunk=2)>"
+
+
+def test_load_checkpoint_missing_chunk_error(session):
+    """Ingestion 006: Verify error if chunk index is missing from load checkpoint record."""
+    session.add(mci.LoadCheckpoints(entity='events', batch_size=500, row_count=500))
+    with pytest.raises(IntegrityError):
+        session.commit()
+
+
+def test_ingestion_indexes():
+    """Ingestion 007: Verify indexes of ingestion ledger and load checkpoint tables."""
+    ledger_indexes = {index.name: [column.name for column in index.columns]
+                      for index in mci.IngestionLedger.__table__.indexes}
+    checkpoint_indexes = {index.name: [column.name for column in index.columns]
+                          for index in mci.LoadCheckpoints.__table__.indexes}
+    assert ledger_indexes == {'ingestion_ledger_indx': ['entity', 'supplier_id', 'path']}
+    assert checkpoint_indexes == {'load_checkpoints_indx': ['entity', 'supplier_id', 'match_id']}
@@ -0,0 +1,38 @@
+# coding=utf-8
+import pandas as pd
+
+from marcottievents.etl import MarcottiLoad
+
+
+def test_unique_rows_staged_batches():
+    """Load 001: Select rows not staged by previous batches of the same match, without changing them."""
+    seen = {1: {(('value', 'a'),)}}
+    data_frame = pd.DataFrame({'match_id': [1, 1, 2, 2], 'value': ['a', 'b', 'a', 'a']})
+    rows, staged = MarcottiLoad.unique_rows(data_frame, ['value'], seen)
+
+    assert rows == {(('value', 'b'),), (('value', 'a'),)}
+    assert staged == {1: {(('value', 'b'),)}, 2: {(('value', 'a'),)}}
+    assert seen == {1: {(('value', 'a'),)}}
+
+    MarcottiLoad.commit_rows(seen, {2: staged[2]})
+    assert seen == {2: {(('value', 'a'),)}}
+
+
+def test_save_batches_failed_batch_rows(session):
+    """Load 002: Stage rows of a failed batch again in a later batch of the same match."""
+    loader = MarcottiLoad(session, None, batch_size=2)
+    data_frame = pd.DataFrame({'match_id': [1, 1, 1, 1, 1], 'value': ['a', 'b', 'a', 'b', 'a']})
+    seen = {}
+    saved = []
+
+    def save(batch):
+        rows, staged = loader.unique_rows(batch, ['value'], seen)
+        if batch.index[0] == 0:
+            raise ValueError("Batch failed")
+        saved.append(sorted(dict(row)['value'] for row in rows))
+        return staged
+
+    loader.save_batches('events', data_frame, save, seen)
+
+    assert [batch[:3] for batch in loader.failed_batches] == [('events', 0, 1)]
+    assert saved == [['a', 'b'], []]
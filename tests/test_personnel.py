@@ -97,6 +97,23 @@ def test_person_age_query(session, person_data):
     assert son_hm.exact_age(reference_date) == (22, 358)
 
 
+def test_person_search_name(session, person_data):
+    """Person 009: Verify search name is stored with Person's full name and updated with name fields."""
+    persons = [mcp.Persons(**data) for key, records in person_data.items()
+               for data in records if key in ['player', 'manager', 'referee']]
+    session.add_all(persons)
+    session.commit()
+
+    for person in session.query(mcp.Persons):
+        assert person.search_name == person.full_name
+
+    person_from_db = session.query(mcp.Persons).filter(mcp.Persons.search_name == u"Son Heung-Min").one()
+    person_from_db.nick_name = u"Sonny"
+    session.commit()
+
+    assert session.query(mcp.Persons).filter(mcp.Persons.search_name == u"Sonny").one() == person_from_db
+
+
 def test_position_insert(session):
     """Positions 001: Insert generic data into Positions model and verify data."""
     left_fb = mcp.Positions(name=u"Left full-back", type=enums.PositionType.defender)
@@ -0,0 +1,84 @@
+# coding=utf-8
+import uuid
+from datetime import date
+
+import pytest
+
+import marcottievents.models.common.enums as enums
+import marcottievents.models.common.overview as mco
+import marcottievents.models.common.personnel as mcp
+from marcottievents.etl.base.reconcile import PersonReconciler
+
+
+FIELDS = ['known_first_name', 'first_name', 'middle_name', 'last_name', 'second_last_name',
+          'nick_name', 'birth_date', 'order', 'country_id']
+
+
+@pytest.fixture
+def managers(session):
+    country = mco.Countries(name=u"Portugal", confederation=enums.ConfederationType.europe)
+    records = [
+        mcp.Managers(first_name=u"José", last_name=u"Mourinho", birth_date=date(1963, 1, 26), country=country),
+        mcp.Managers(first_name=u"Fernando", last_name=u"Santos", birth_date=date(1954, 10, 10), country=country)
+    ]
+    session.add_all(records)
+    session.commit()
+    return records
+
+
+def test_reconciler_existing_person(session, managers):
+    """Reconcile 001: Map remote ID to existing person with same normalized identity."""
+    reconciler = PersonReconciler(session, mcp.Managers, FIELDS)
+    inserts, updates, maps = reconciler.classify(
+        [dict(remote_id='100', first_name=u"  JOSÉ ", last_name=u"mourinho", birth_date=date(1963, 1, 26),
+              country_id=managers[0].country_id)], lambda remote_id: None)
+
+    assert inserts == [] and updates == []
+    assert maps == [('100', managers[0].id)]
+
+
+def test_reconciler_new_person(session, managers):
+    """Reconcile 002: Insert person that is neither mapped nor in the database, once."""
+    reconciler = PersonReconciler(session, mcp.Managers, FIELDS)
+    person = dict(first_name=u"Paulo", last_name=u"Bento", birth_date=date(1969, 6, 20),
+                  country_id=managers[0].country_id)
+    inserts, updates, maps = reconciler.classify([dict(person, remote_id='200'), dict(person, remote_id='201')],
+                                                 lambda remote_id: None)
+
+    assert len(inserts) == 1
+    assert inserts[0]['last_name'] == u"Bento"
+    assert isinstance(inserts[0]['id'], uuid.UUID) and isinstance(inserts[0]['person_id'], uuid.UUID)
+    assert maps == [('200', inserts[0]['id']), ('201', inserts[0]['id'])]
+    assert updates == []
+
+
+def test_reconciler_changed_person(session, managers):
+    """Reconcile 003: Update mapped person whose fields differ from the database record."""
+    reconciler = PersonReconciler(session, mcp.Managers, FIELDS)
+    mapped = {'300': managers[1].id, '301': managers[0].id}
+    inserts, updates, maps = reconciler.classify(
+        [dict(remote_id='300', first_name=u"Fernando", last_name=u"Santos", nick_name=u"Engenheiro"),
+         dict(remote_id='301', first_name=u"José", last_name=u"Mourinho", nick_name=None)], mapped.get)
+
+    assert inserts == [] and maps == []
+    assert len(updates) == 1
+    assert updates[0]['id'] == managers[1].id
+    assert updates[0]['nick_name'] == u"Engenheiro"
+    assert updates[0]['birth_date'] == date(1954, 10, 10)
+
+
+def test_reconciler_staged_records(session, managers):
+    """Reconcile 004: Reuse person index with the records classified by earlier batches."""
+    reconciler = PersonReconciler(session, mcp.Managers, FIELDS)
+    person = dict(first_name=u"Paulo", last_name=u"Bento", country_id=managers[0].country_id)
+    inserts, _, _ = reconciler.classify([dict(person, remote_id='400')], lambda remote_id: None)
+    mapped = {'400': inserts[0]['id']}
+
+    again, updates, maps = reconciler.classify([dict(person, remote_id='401')], mapped.get)
+    assert again == [] and updates == []
+    assert maps == [('401', inserts[0]['id'])]
+
+    _, updates, _ = reconciler.classify([dict(person, remote_id='400', nick_name=u"Bento")], mapped.get)
+    assert [update['nick_name'] for update in updates] == [u"Bento"]
+    _, updates, _ = reconciler.classify([dict(person, remote_id='400', nick_name=u"Bento")], mapped.get)
+    assert updates == []
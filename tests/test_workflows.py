@@ -0,0 +1,36 @@
+# coding=utf-8
+import logging
+from datetime import date, time, datetime
+
+import pandas as pd
+
+from marcottievents.etl.base.workflows import WorkflowBase
+
+
+def test_parse_times(caplog):
+    """Workflow 001: Convert time strings with optional seconds into time objects."""
+    with caplog.at_level(logging.WARNING):
+        times = WorkflowBase.parse_times(pd.Series(['15:00', '15:00:00', ' 19:45:30 ', '3:05 pm', time(12, 30),
+                                                    '', None, 'kickoff'], index=range(10, 18)))
+
+    assert times.tolist() == [time(15, 0), time(15, 0), time(19, 45, 30), time(15, 5), time(12, 30),
+                              None, None, None]
+    assert times.index.tolist() == range(10, 18)
+    assert "1 times do not match any time format" in caplog.text
+
+
+def test_parse_dates():
+    """Workflow 002: Convert date strings into date objects, with None for invalid dates."""
+    dates = WorkflowBase.parse_dates(pd.Series(['2016-05-15', '2016-02-30', None]))
+
+    assert dates.tolist() == [date(2016, 5, 15), None, None]
+
+
+def test_parse_timestamps(caplog):
+    """Workflow 003: Keep event timestamp strings as they appear in the data feed."""
+    with caplog.at_level(logging.WARNING):
+        timestamps = WorkflowBase.parse_timestamps(pd.Series(['2016-05-15 15:01:02.442', 'bogus', None,
+                                                              datetime(2016, 5, 15, 15, 1, 2)]))
+
+    assert timestamps.tolist() == ['2016-05-15 15:01:02.442', 'bogus', None, '2016-05-15T15:01:02']
+    assert "1 timestamps do not match the timestamp format" in caplog.text